@@ -3,12 +3,14 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from flask_socketio import SocketIO
 from config import config
 
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
+socketio = SocketIO()
 
 # Import mail after defining it in utils/email.py
 from app.utils.email import mail
@@ -27,6 +29,15 @@ def create_app(config_name='default'):
     migrate.init_app(app, db)
     mail.init_app(app)
     
+    from app.utils.cache import init_cache
+    init_cache(app)
+    
+    from app.utils.rate_limit import init_rate_limiter
+    init_rate_limiter(app)
+    
+    from app.utils.realtime import init_realtime
+    init_realtime(app)
+    
     # Configure login manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -47,6 +58,17 @@ def create_app(config_name='default'):
     app.register_blueprint(admin.bp)
     app.register_blueprint(errors.bp)
     
+    # Log how many queries each request ran so N+1 patterns show up in dev
+    if app.config.get('SQLALCHEMY_RECORD_QUERIES'):
+        from flask import request
+        from flask_sqlalchemy.record_queries import get_recorded_queries
+        
+        @app.after_request
+        def log_query_count(response):
+            queries = get_recorded_queries()
+            app.logger.debug(f'{request.method} {request.path}: {len(queries)} queries')
+            return response
+    
     # Register template helpers
     from app.utils.template_helpers import (
         get_profile_picture_url,
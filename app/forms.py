@@ -1,9 +1,12 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SelectField, IntegerField, TextAreaField, RadioField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, NumberRange
+from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, NumberRange, Optional
 from flask_wtf.file import FileField, FileAllowed
 from app.models import User
 
+# Most pages one print request may have
+MAX_PAGES = 1000
+
 # Faculty department choices
 FACULTY_DEPARTMENTS = [
     ('Elementary School', 'Elementary School'),
@@ -77,9 +80,10 @@ class PrintRequestForm(FlaskForm):
         DataRequired(message='Please upload at least one file'),
         FileAllowed(['pdf', 'doc', 'docx'], 'Only PDF, DOC, and DOCX files are allowed')
     ], render_kw={'multiple': True})
+    # Read from the file for PDFs; only needed for DOC/DOCX uploads
     number_of_pages = IntegerField('Number of Pages', validators=[
-        DataRequired(message='Please specify number of pages'),
-        NumberRange(min=1, max=1000, message='Number of pages must be between 1 and 1000')
+        Optional(),
+        NumberRange(min=1, max=MAX_PAGES, message=f'Number of pages must be between 1 and {MAX_PAGES}')
     ])
     page_range = StringField('Page Range (Optional)', 
         validators=[Length(max=255, message='Page range must not exceed 255 characters')],
@@ -1,6 +1,5 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 import secrets
 import string
@@ -8,8 +7,9 @@ import string
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
+    """Load user by ID for Flask-Login, from the user cache when possible"""
+    from app.utils.user_cache import load_cached_user
+    return load_cached_user(int(user_id))
 
 
 class User(UserMixin, db.Model):
@@ -31,11 +31,18 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        from app.utils.passwords import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        from app.utils.passwords import verify_password
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses an older method or cost than configured"""
+        from app.utils.passwords import password_needs_rehash
+        return password_needs_rehash(self.password_hash)
     
     def get_pending_requests_count(self):
         """Get count of pending print requests"""
@@ -52,6 +59,12 @@ class User(UserMixin, db.Model):
 class PrintRequest(db.Model):
     """Print request model"""
     __tablename__ = 'print_requests'
+    __table_args__ = (
+        # Dashboards filter by owner or status and list newest first
+        db.Index('ix_print_requests_user_id_submitted_at', 'user_id', 'submitted_at'),
+        db.Index('ix_print_requests_status_submitted_at', 'status', 'submitted_at'),
+        db.Index('ix_print_requests_submitted_at', 'submitted_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     request_number = db.Column(db.String(20), unique=True, nullable=False, index=True)
@@ -60,9 +73,12 @@ class PrintRequest(db.Model):
     # File information
     file_path = db.Column(db.String(255), nullable=False)
     file_name = db.Column(db.String(255), nullable=False)
+    file_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the contents
     
     # Print specifications
     number_of_pages = db.Column(db.Integer, nullable=False)
+    page_count_detected = db.Column(db.Boolean, default=False, nullable=False)  # read from the PDF, not typed
+    detected_page_size = db.Column(db.String(20), nullable=True)  # most common page size in the PDF, e.g. 'A4'
     page_range = db.Column(db.String(255), nullable=True)  # e.g., "1-5, 8, 10-15" or None for all pages
     number_of_copies = db.Column(db.Integer, nullable=False)
     is_double_sided = db.Column(db.Boolean, default=False, nullable=False)
@@ -77,6 +93,9 @@ class PrintRequest(db.Model):
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Relationship
+    events = db.relationship('RequestEvent', backref='print_request', lazy='dynamic', cascade='all, delete-orphan')
+    
     @staticmethod
     def generate_request_number():
         """Generate a unique request number"""
@@ -109,10 +128,165 @@ class PrintRequest(db.Model):
         except:
             return self.page_range  # Return raw string if parsing fails
     
-    def update_status(self, new_status):
-        """Update request status and timestamp"""
+    def update_status(self, new_status, actor=None, note=None):
+        """
+        Move the request to a new status and log the change
+        
+        Raises ValueError if the workflow doesn't allow the transition.
+        """
+        from app.utils.quotas import record_quota_change
+        from app.utils.stats import record_status_change
+        from app.utils.workflow import check_transition, record_event
+        allowed, message = check_transition(self.status, new_status)
+        if not allowed:
+            raise ValueError(message)
+        record_status_change(db.session, self.status, new_status)
+        record_event(db.session, self.id, self.status, new_status, actor.id if actor else None, note)
+        record_quota_change(db.session, self, self.status, new_status, self.user.faculty_department)
         self.status = new_status
         self.updated_at = datetime.utcnow()
     
     def __repr__(self):
         return f'<PrintRequest {self.request_number}>'
+
+
+class DocumentBlob(db.Model):
+    """Stored document contents, shared by every request that uploaded them"""
+    __tablename__ = 'document_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<DocumentBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
+class Job(db.Model):
+    """Background job waiting for (or handled by) `flask worker`"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers look for the oldest due job
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    @property
+    def wait_seconds(self):
+        """Time between becoming due and being picked up"""
+        if not self.started_at:
+            return 0.0
+        return max((self.started_at - self.run_at).total_seconds(), 0.0)
+    
+    @property
+    def run_seconds(self):
+        """Time the last attempt took"""
+        if not self.started_at or not self.finished_at:
+            return 0.0
+        return (self.finished_at - self.started_at).total_seconds()
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+
+class RequestEvent(db.Model):
+    """One status change of a print request (append-only)"""
+    __tablename__ = 'request_events'
+    __table_args__ = (
+        # History is read per request in order; turnaround reports scan completions by date
+        db.Index('ix_request_events_request_id_created_at', 'request_id', 'created_at'),
+        db.Index('ix_request_events_to_status_created_at', 'to_status', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('print_requests.id'), nullable=False)
+    from_status = db.Column(db.String(20), nullable=True)  # None when the request was submitted
+    to_status = db.Column(db.String(20), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    note = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    actor = db.relationship('User', foreign_keys=[actor_id])
+    
+    def __repr__(self):
+        return f'<RequestEvent {self.request_id} {self.from_status}->{self.to_status}>'
+
+
+class RequestStatusCount(db.Model):
+    """Materialized count of print requests per status"""
+    __tablename__ = 'request_status_counts'
+    
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<RequestStatusCount {self.status}={self.count}>'
+
+
+class QuotaBudget(db.Model):
+    """Page limit per quota period for one user or department"""
+    __tablename__ = 'quota_budgets'
+
+    scope = db.Column(db.String(20), primary_key=True)  # 'user' or 'department'
+    subject = db.Column(db.String(100), primary_key=True)  # user id or department name
+    pages = db.Column(db.Integer, nullable=False)  # 0 means no limit
+
+    def __repr__(self):
+        return f'<QuotaBudget {self.scope}:{self.subject} {self.pages}>'
+
+
+class QuotaBalance(db.Model):
+    """Running page totals for one user or department in one quota period"""
+    __tablename__ = 'quota_balances'
+
+    scope = db.Column(db.String(20), primary_key=True)  # 'user' or 'department'
+    subject = db.Column(db.String(100), primary_key=True)  # user id or department name
+    period = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    reserved_pages = db.Column(db.Integer, default=0, nullable=False)  # pending and in progress
+    used_pages = db.Column(db.Integer, default=0, nullable=False)  # completed
+
+    def __repr__(self):
+        return f'<QuotaBalance {self.scope}:{self.subject} {self.period}>'
+
+
+class NotificationDigest(db.Model):
+    """When each periodic summary email was last sent"""
+    __tablename__ = 'notification_digests'
+
+    name = db.Column(db.String(50), primary_key=True)  # e.g. 'new_requests'
+    last_sent_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<NotificationDigest {self.name} {self.last_sent_at}>'
+
+
+@db.event.listens_for(PrintRequest, 'after_insert')
+def _count_new_request(mapper, connection, target):
+    """Keep status counters and quota balances in sync when a request is created, and log it"""
+    from app.utils.quotas import record_quota_change
+    from app.utils.stats import record_status_change
+    from app.utils.workflow import record_event
+    record_status_change(connection, None, target.status)
+    record_quota_change(connection, target, None, target.status)
+    record_event(connection, target.id, None, target.status, target.user_id, created_at=target.submitted_at)
+
+
+@db.event.listens_for(PrintRequest, 'after_delete')
+def _count_deleted_request(mapper, connection, target):
+    """Keep status counters and quota balances in sync when a request is deleted"""
+    from app.utils.quotas import record_quota_change
+    from app.utils.stats import record_status_change
+    record_status_change(connection, target.status, None)
+    record_quota_change(connection, target, target.status, None)
@@ -1,34 +1,47 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file
-from flask_login import login_required
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context
+from flask_login import login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from werkzeug.http import dump_options_header
 from app import db
 from app.utils.decorators import admin_required
 from app.models import PrintRequest, User
-from app.utils import get_file_path
+from app.utils import get_file_path, send_document
+from app.utils.analytics import get_usage_report, usage_report_to_csv, iter_requests_csv
+from app.utils.pagination import paginate_requests
+from app.utils.bulk import bulk_update_status
+from app.utils.realtime import emit_request_update, emit_bulk_update
+from app.utils.scheduler import get_print_schedule
+from app.utils.stats import REQUEST_STATUSES, get_request_stats
+from app.utils.template_helpers import invalidate_pending_count
+from app.utils.workflow import check_transition, get_allowed_transitions, get_request_history, get_turnaround_metrics
 import os
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# The schedule page shows this many batches; the JSON endpoint returns all
+SCHEDULE_PAGE_BATCHES = 50
+
 
 @bp.route('/dashboard')
 @login_required
 @admin_required
 def dashboard():
     """Admin dashboard overview"""
-    # Get statistics
-    total_requests = PrintRequest.query.count()
-    pending_count = PrintRequest.query.filter_by(status='pending').count()
-    in_progress_count = PrintRequest.query.filter_by(status='in_progress').count()
-    completed_count = PrintRequest.query.filter_by(status='completed').count()
+    # Get statistics from the status counters
+    stats = get_request_stats()
     total_users = User.query.filter_by(is_admin=False).count()
     
     # Get recent requests
-    recent_requests = PrintRequest.query.order_by(PrintRequest.submitted_at.desc()).limit(10).all()
+    recent_requests = PrintRequest.query.options(joinedload(PrintRequest.user))\
+        .order_by(PrintRequest.submitted_at.desc()).limit(10).all()
     
     return render_template('admin/dashboard.html',
-                         total_requests=total_requests,
-                         pending_count=pending_count,
-                         in_progress_count=in_progress_count,
-                         completed_count=completed_count,
+                         total_requests=stats['total'],
+                         pending_count=stats['pending'],
+                         in_progress_count=stats['in_progress'],
+                         completed_count=stats['completed'],
                          total_users=total_users,
                          recent_requests=recent_requests)
 
@@ -38,34 +51,108 @@ def dashboard():
 @admin_required
 def admin_requests():
     """Admin view of all print requests"""
-    # Get filter from query params
+    # Get filter and page position from query params
     status_filter = request.args.get('status', 'all')
+    cursor = request.args.get('cursor')
     
-    # Base query
-    query = PrintRequest.query
+    # Base query - load each request's user in the same query
+    query = PrintRequest.query.options(joinedload(PrintRequest.user))
     
     # Apply filter
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    # Get all requests
-    all_requests = query.order_by(PrintRequest.submitted_at.desc()).all()
+    # Get one page of requests
+    page_requests, next_cursor = paginate_requests(query, cursor)
     
-    # Group by status for display
-    pending = [r for r in all_requests if r.status == 'pending']
-    in_progress = [r for r in all_requests if r.status == 'in_progress']
-    completed = [r for r in all_requests if r.status == 'completed']
-    cancelled = [r for r in all_requests if r.status == 'cancelled']
+    # Tab counts come from the status counters, not the rows on this page
+    counts = get_request_stats()
     
     return render_template('admin/requests.html',
-                         all_requests=all_requests,
-                         pending=pending,
-                         in_progress=in_progress,
-                         completed=completed,
-                         cancelled=cancelled,
+                         requests=page_requests,
+                         counts=counts,
+                         next_cursor=next_cursor,
+                         cursor=cursor,
                          status_filter=status_filter)
 
 
+@bp.route('/schedule')
+@login_required
+@admin_required
+def schedule():
+    """Pending requests grouped into print batches, most urgent first"""
+    batches = get_print_schedule()
+    return render_template('admin/schedule.html',
+                         batches=batches[:SCHEDULE_PAGE_BATCHES],
+                         total_batches=len(batches))
+
+
+@bp.route('/schedule.json')
+@login_required
+@admin_required
+def schedule_json():
+    """Print schedule as JSON (for print-room tools)"""
+    batches = get_print_schedule()
+    return jsonify({'batches': [batch.to_dict() for batch in batches]})
+
+
+@bp.route('/reports/usage')
+@login_required
+@admin_required
+def usage_report():
+    """Cost and page totals per department per month, as CSV or JSON"""
+    # Optional date range, e.g. ?from=2026-09-01&to=2026-09-30 (inclusive)
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    report = get_usage_report(start, end)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({'rows': report})
+    
+    return Response(
+        usage_report_to_csv(report),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=usage_report.csv'}
+    )
+
+
+@bp.route('/reports/turnaround')
+@login_required
+@admin_required
+def turnaround_report():
+    """Queue, printing and total turnaround times for completed requests, as JSON"""
+    # Optional range of completion dates, e.g. ?from=2026-09-01&to=2026-09-30 (inclusive)
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    return jsonify(get_turnaround_metrics(start, end))
+
+
+@bp.route('/requests/export')
+@login_required
+@admin_required
+def export_requests():
+    """Download all requests (or one status) as CSV, streamed as it's read"""
+    status_filter = request.args.get('status', 'all')
+    if status_filter != 'all' and status_filter not in REQUEST_STATUSES:
+        return jsonify({'error': f'Unknown status: {status_filter}'}), 400
+    status = None if status_filter == 'all' else status_filter
+    filename = f'print_requests_{status_filter}_{datetime.utcnow():%Y%m%d}.csv'
+    
+    return Response(
+        stream_with_context(iter_requests_csv(status)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': dump_options_header('attachment', {'filename': filename})}
+    )
+
+
 @bp.route('/request/<int:request_id>')
 @login_required
 @admin_required
@@ -75,7 +162,9 @@ def view_request(request_id):
     print_request = PrintRequest.query.get_or_404(request_id)
     form = StatusUpdateForm()
     form.status.data = print_request.status
-    return render_template('admin/view_request.html', request=print_request, form=form)
+    return render_template('admin/view_request.html', request=print_request, form=form,
+                         allowed_statuses=get_allowed_transitions(print_request.status),
+                         history=get_request_history(print_request.id))
 
 
 @bp.route('/request/<int:request_id>/status', methods=['POST'])
@@ -91,25 +180,23 @@ def update_status(request_id):
     new_status = request.form.get('status')
     admin_notes = request.form.get('admin_notes', '').strip()
     
-    # Validate status
-    valid_statuses = ['pending', 'in_progress', 'completed', 'cancelled']
-    if new_status not in valid_statuses:
-        flash('Invalid status selected.', 'error')
+    # Validate status against the workflow
+    allowed, message = check_transition(print_request.status, new_status)
+    if not allowed:
+        flash(message, 'error')
         return redirect(url_for('admin.view_request', request_id=request_id))
     
     # Update status
     old_status = print_request.status
-    print_request.update_status(new_status)
-    
-    # Update admin notes if provided
-    if admin_notes:
-        print_request.admin_notes = admin_notes
+    print_request.update_status(new_status, actor=current_user, note=admin_notes)
     
     db.session.commit()
+    invalidate_pending_count()
+    emit_request_update(print_request, old_status)
     
     # Send email notification to user
     try:
-        send_status_update_email(print_request.user, print_request, old_status, new_status)
+        send_status_update_email(print_request.user, print_request, old_status, new_status, admin_notes)
         flash(f'Request status updated from "{old_status}" to "{new_status}". Email notification sent to {print_request.user.name}.', 'success')
     except Exception as e:
         flash(f'Request status updated from "{old_status}" to "{new_status}". Warning: Email notification failed.', 'warning')
@@ -121,6 +208,59 @@ def update_status(request_id):
     return redirect(url_for('admin.view_request', request_id=request_id))
 
 
+@bp.route('/requests/bulk-status', methods=['POST'])
+@login_required
+@admin_required
+def bulk_status():
+    """
+    Change the status of many requests at once
+    
+    Takes a form post from the requests page (request_ids, status,
+    admin_notes) or JSON ({"ids": [...], "status": "...", "admin_notes": "..."}),
+    and answers JSON requests with JSON.
+    """
+    from app.utils.email import send_bulk_status_emails
+    
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        raw_ids = data.get('ids') or []
+    else:
+        data = request.form
+        raw_ids = request.form.getlist('request_ids')
+    
+    try:
+        request_ids = [int(i) for i in raw_ids]
+    except (TypeError, ValueError):
+        request_ids = None
+    
+    new_status = data.get('status')
+    admin_notes = (data.get('admin_notes') or '').strip()
+    
+    if request_ids is None:
+        success, message, changed = False, 'Request IDs must be numbers.', []
+    else:
+        success, message, changed = bulk_update_status(request_ids, new_status, current_user.id, admin_notes)
+    
+    if changed:
+        invalidate_pending_count()
+        emit_bulk_update(changed, new_status)
+        try:
+            send_bulk_status_emails(changed, new_status, admin_notes)
+        except Exception:
+            message += ' Warning: Email notifications failed.'
+            current_app.logger.exception('Bulk status emails failed')
+    
+    if request.is_json:
+        return jsonify({
+            'success': success,
+            'message': message,
+            'updated': [change['id'] for change in changed]
+        }), 200 if success else 400
+    
+    flash(message, 'success' if success else 'error')
+    return redirect(request.referrer or url_for('admin.admin_requests'))
+
+
 @bp.route('/request/<int:request_id>/download')
 @login_required
 @admin_required
@@ -136,12 +276,8 @@ def download_file(request_id):
         flash('File not found.', 'error')
         return redirect(url_for('admin.view_request', request_id=request_id))
     
-    # Send file
-    return send_file(
-        file_path,
-        as_attachment=True,
-        download_name=print_request.file_name
-    )
+    # Send file (honours If-None-Match and Range)
+    return send_document(print_request.file_path, print_request.file_name, print_request.file_hash)
 
 
 @bp.route('/users')
@@ -150,7 +286,14 @@ def download_file(request_id):
 def users():
     """View all users"""
     all_users = User.query.filter_by(is_admin=False).order_by(User.created_at.desc()).all()
-    return render_template('admin/users.html', users=all_users)
+    
+    # Count requests for every user in one grouped query
+    request_counts = dict(
+        db.session.query(PrintRequest.user_id, func.count(PrintRequest.id))
+        .group_by(PrintRequest.user_id)
+    )
+    
+    return render_template('admin/users.html', users=all_users, request_counts=request_counts)
 
 
 @bp.route('/user/<int:user_id>')
@@ -159,6 +302,7 @@ def users():
 def view_user(user_id):
     """View specific user and their requests"""
     user = User.query.get_or_404(user_id)
+    # request.user for these rows resolves from the identity map without a query
     user_requests = PrintRequest.query.filter_by(user_id=user_id)\
         .order_by(PrintRequest.submitted_at.desc()).all()
     
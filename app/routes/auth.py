@@ -3,6 +3,8 @@ from flask_login import login_user, logout_user, current_user
 from app import db
 from app.models import User
 from app.forms import LoginForm, RegistrationForm
+from app.utils.passwords import PasswordHasherBusy
+from app.utils.rate_limit import login_blocked, record_login_failure, clear_login_failures
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -17,11 +19,32 @@ def login():
     form = LoginForm()
     
     if form.validate_on_submit():
+        # Turn away repeated failures before touching the database or hashing
+        if login_blocked(form.email.data, request.remote_addr):
+            flash('Too many failed login attempts. Please wait a few minutes and try again.', 'error')
+            return render_template('auth/login.html', form=form), 429
+        
         # Find user by email
         user = User.query.filter_by(email=form.email.data).first()
         
         # Check if user exists and password is correct
-        if user and user.check_password(form.password.data):
+        try:
+            password_ok = user is not None and user.check_password(form.password.data)
+        except PasswordHasherBusy:
+            flash('The server is busy right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', form=form)
+        
+        if password_ok:
+            clear_login_failures(form.email.data)
+            
+            # Upgrade the stored hash if the hashing settings have changed
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(form.password.data)
+                    db.session.commit()
+                except PasswordHasherBusy:
+                    pass  # try again next login
+            
             # Log in the user
             login_user(user, remember=form.remember_me.data)
             flash('Welcome back! You have been logged in successfully.', 'success')
@@ -32,6 +55,7 @@ def login():
                 return redirect(next_page)
             return redirect(url_for('requests.dashboard'))
         else:
+            record_login_failure(form.email.data, request.remote_addr)
             flash('Invalid email or password. Please try again.', 'error')
     
     return render_template('auth/login.html', form=form)
@@ -55,7 +79,11 @@ def register():
             faculty_department=form.faculty_department.data,
             is_admin=False
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except PasswordHasherBusy:
+            flash('The server is busy right now. Please try again in a moment.', 'warning')
+            return render_template('auth/register.html', form=form)
         
         # Save to database
         db.session.add(user)
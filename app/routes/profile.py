@@ -1,8 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, send_file
 from flask_login import login_required, current_user
 from app import db
 from app.forms import ProfileUpdateForm
-from app.utils import save_profile_picture, delete_file, flash_form_errors
+from app.utils import save_profile_picture, flash_form_errors
+from app.utils.avatars import AVATAR_MAX_AGE, AVATAR_NAME_RE, AVATAR_SIZES, choose_avatar_format, get_avatar_variant, retire_avatar
+from app.utils.passwords import PasswordHasherBusy
+from app.utils.stats import count_by_status
+from app.utils.user_cache import invalidate_user
 import os
 
 bp = Blueprint('profile', __name__, url_prefix='/profile')
@@ -12,16 +16,14 @@ bp = Blueprint('profile', __name__, url_prefix='/profile')
 @login_required
 def view_profile():
     """View user profile"""
-    # Get user statistics
-    total_requests = current_user.print_requests.count()
-    pending_requests = current_user.print_requests.filter_by(status='pending').count()
-    completed_requests = current_user.print_requests.filter_by(status='completed').count()
+    # Get user statistics with one grouped query
+    counts = count_by_status(current_user.id)
     
     return render_template('profile/view.html', 
                          user=current_user,
-                         total_requests=total_requests,
-                         pending_requests=pending_requests,
-                         completed_requests=completed_requests)
+                         total_requests=sum(counts.values()),
+                         pending_requests=counts['pending'],
+                         completed_requests=counts['completed'])
 
 
 @bp.route('/edit', methods=['GET', 'POST'])
@@ -35,11 +37,8 @@ def edit_profile():
         current_user.name = form.name.data
         
         # Handle profile picture upload
+        old_picture = current_user.profile_picture
         if form.profile_picture.data:
-            # Delete old profile picture if exists
-            if current_user.profile_picture:
-                delete_file(current_user.profile_picture)
-            
             # Save new profile picture
             success, message, file_path = save_profile_picture(
                 form.profile_picture.data, 
@@ -54,6 +53,11 @@ def edit_profile():
         
         # Save changes
         db.session.commit()
+        invalidate_user(current_user.id)
+        
+        # Delete the old picture once no cached page can still link to it
+        if old_picture and old_picture != current_user.profile_picture:
+            retire_avatar(old_picture)
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile.view_profile'))
     
@@ -78,7 +82,12 @@ def change_password():
         confirm_password = request.form.get('confirm_password')
         
         # Validate current password
-        if not current_user.check_password(current_password):
+        try:
+            current_ok = current_user.check_password(current_password)
+        except PasswordHasherBusy:
+            flash('The server is busy right now. Please try again in a moment.', 'warning')
+            return render_template('profile/change_password.html')
+        if not current_ok:
             flash('Current password is incorrect.', 'error')
             return render_template('profile/change_password.html')
         
@@ -93,8 +102,13 @@ def change_password():
             return render_template('profile/change_password.html')
         
         # Update password
-        current_user.set_password(new_password)
+        try:
+            current_user.set_password(new_password)
+        except PasswordHasherBusy:
+            flash('The server is busy right now. Please try again in a moment.', 'warning')
+            return render_template('profile/change_password.html')
         db.session.commit()
+        invalidate_user(current_user.id)
         
         flash('Password changed successfully!', 'success')
         return redirect(url_for('profile.view_profile'))
@@ -107,15 +121,40 @@ def change_password():
 def delete_picture():
     """Delete profile picture"""
     if current_user.profile_picture:
-        # Delete file from storage
-        delete_file(current_user.profile_picture)
+        old_picture = current_user.profile_picture
         
         # Remove from database
         current_user.profile_picture = None
         db.session.commit()
+        invalidate_user(current_user.id)
+        
+        # Delete the file once no cached page can still link to it
+        retire_avatar(old_picture)
         
         flash('Profile picture deleted successfully.', 'success')
     else:
         flash('No profile picture to delete.', 'info')
     
     return redirect(url_for('profile.edit_profile'))
+
+
+@bp.route('/picture/<name>/<size>')
+@login_required
+def picture(name, size):
+    """Serve a profile picture at one of the display sizes, in the best format the browser takes"""
+    if not AVATAR_NAME_RE.match(name) or size not in AVATAR_SIZES:
+        abort(404)
+    
+    image_format = choose_avatar_format(request.accept_mimetypes)
+    path = get_avatar_variant(name, size, image_format)
+    if path is None:
+        abort(404)
+    
+    # The name is a content hash, so this URL's picture never changes
+    response = send_file(path, mimetype=image_format[2], conditional=True,
+                         etag=f'{name}-{size}-{image_format[0]}', max_age=AVATAR_MAX_AGE)
+    response.cache_control.public = False  # behind login, so browsers only
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
@@ -1,9 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import PrintRequest
-from app.forms import PrintRequestForm
-from app.utils import save_document, flash_form_errors, get_file_path
+from app.forms import PrintRequestForm, MAX_PAGES
+from app.utils import save_document, flash_form_errors, get_file_path, send_document, detect_page_count, delete_file
+from app.utils.email import notify_new_request
+from app.utils.jobs import enqueue
+from app.utils.page_range_parser import parse_page_range
+from app.utils.pagination import paginate_requests
+from app.utils.quotas import check_quota
+from app.utils.realtime import emit_new_request, emit_request_update
+from app.utils.stats import count_by_status
+from app.utils.template_helpers import invalidate_pending_count
 import os
 
 bp = Blueprint('requests', __name__, url_prefix='/requests')
@@ -12,21 +20,22 @@ bp = Blueprint('requests', __name__, url_prefix='/requests')
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    """User dashboard showing all print requests"""
-    # Get all requests for current user, sorted by most recent first
-    requests = PrintRequest.query.filter_by(user_id=current_user.id)\
-        .order_by(PrintRequest.submitted_at.desc()).all()
+    """User dashboard showing the current user's print requests"""
+    # Get one page of requests for current user, most recent first
+    query = PrintRequest.query.filter_by(user_id=current_user.id)
+    requests, next_cursor = paginate_requests(query, request.args.get('cursor'))
     
-    # Get counts by status
-    pending_count = sum(1 for r in requests if r.status == 'pending')
-    in_progress_count = sum(1 for r in requests if r.status == 'in_progress')
-    completed_count = sum(1 for r in requests if r.status == 'completed')
+    # Get counts by status with one grouped query
+    counts = count_by_status(user_id=current_user.id)
     
     return render_template('requests/dashboard.html', 
                          requests=requests,
-                         pending_count=pending_count,
-                         in_progress_count=in_progress_count,
-                         completed_count=completed_count)
+                         next_cursor=next_cursor,
+                         cursor=request.args.get('cursor'),
+                         total_count=sum(counts.values()),
+                         pending_count=counts['pending'],
+                         in_progress_count=counts['in_progress'],
+                         completed_count=counts['completed'])
 
 
 @bp.route('/new', methods=['GET', 'POST'])
@@ -38,12 +47,38 @@ def new_request():
     if form.validate_on_submit():
         # Handle file upload
         file = form.file.data
-        success, message, file_path = save_document(file, current_user.id)
+        success, message, file_path, file_hash = save_document(file, current_user.id)
         
         if not success:
             flash(message, 'error')
             return render_template('requests/new_request.html', form=form)
         
+        # Use the real page count for PDFs rather than the typed one
+        detected_pages = detect_page_count(file_path, file.filename)
+        number_of_pages = detected_pages or form.number_of_pages.data
+        
+        error = None
+        if detected_pages is not None and not 1 <= detected_pages <= MAX_PAGES:
+            # Same bound the form puts on a typed page count
+            error = f'The document has {detected_pages} pages; requests must have between 1 and {MAX_PAGES}.'
+        elif not number_of_pages:
+            error = 'Please specify the number of pages for DOC/DOCX files.'
+        else:
+            pages = parse_page_range(form.page_range.data)
+            if pages and pages[-1] > number_of_pages:
+                error = f'Page range goes up to page {pages[-1]}, but the document has {number_of_pages} pages.'
+            else:
+                allowed, message = check_quota(current_user, number_of_pages * form.number_of_copies.data)
+                if not allowed:
+                    error = message
+        
+        if error:
+            # Drop the stored upload again
+            delete_file(file_path)
+            db.session.commit()
+            flash(error, 'error')
+            return render_template('requests/new_request.html', form=form)
+        
         # Generate unique request number
         request_number = PrintRequest.generate_request_number()
         
@@ -53,7 +88,9 @@ def new_request():
             user_id=current_user.id,
             file_path=file_path,
             file_name=file.filename,
-            number_of_pages=form.number_of_pages.data,
+            file_hash=file_hash,
+            number_of_pages=number_of_pages,
+            page_count_detected=detected_pages is not None,
             page_range=form.page_range.data.strip() if form.page_range.data else None,
             number_of_copies=form.number_of_copies.data,
             is_double_sided=form.is_double_sided.data,
@@ -68,6 +105,17 @@ def new_request():
         # Save to database
         db.session.add(print_request)
         db.session.commit()
+        invalidate_pending_count()
+        emit_new_request(print_request)
+        
+        # Work out page sizes in the background
+        if detected_pages:
+            enqueue('analyze_document', {'request_id': print_request.id})
+        
+        try:
+            notify_new_request(print_request, current_user)
+        except Exception as e:
+            current_app.logger.error(f'Admin notification failed: {str(e)}')
         
         flash(f'Print request submitted successfully! Request number: {request_number}', 'success')
         return redirect(url_for('requests.view_request', request_id=print_request.id))
@@ -112,8 +160,10 @@ def cancel_request(request_id):
         return redirect(url_for('requests.view_request', request_id=request_id))
     
     # Update status to cancelled
-    print_request.update_status('cancelled')
+    print_request.update_status('cancelled', actor=current_user)
     db.session.commit()
+    invalidate_pending_count()
+    emit_request_update(print_request, 'pending')
     
     flash('Print request cancelled successfully.', 'success')
     return redirect(url_for('requests.dashboard'))
@@ -139,9 +189,5 @@ def download_file(request_id):
         flash('File not found.', 'error')
         return redirect(url_for('requests.view_request', request_id=request_id))
     
-    # Send file
-    return send_file(
-        file_path,
-        as_attachment=True,
-        download_name=print_request.file_name
-    )
+    # Send file (honours If-None-Match and Range)
+    return send_document(print_request.file_path, print_request.file_name, print_request.file_hash)
@@ -126,9 +126,9 @@ function validatePrintRequestForm(form) {
         }
     }
     
-    // Validate number of pages
+    // Validate number of pages (optional - PDFs are counted on the server)
     const pagesInput = form.querySelector('input[name="number_of_pages"]');
-    if (pagesInput) {
+    if (pagesInput && pagesInput.value) {
         const pagesValidation = validateNumberRange(pagesInput, 1, 1000);
         if (!pagesValidation.valid) {
             showFieldError(pagesInput, pagesValidation.message);
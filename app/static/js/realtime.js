@@ -0,0 +1,92 @@
+/**
+ * Live request updates for the School Print Request System
+ *
+ * Listens on the Socket.IO connection and patches status badges, counters
+ * and the admin queue in place instead of reloading the page.
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (typeof io === 'undefined') {
+        return;
+    }
+    
+    const socket = io();
+    let newRequests = 0;
+    
+    // One of the current user's own requests changed
+    socket.on('request_updated', function(data) {
+        updateRequestCard(data);
+        adjustStat(data.old_status, -1);
+        adjustStat(data.status, 1);
+    });
+    
+    // Admins: something changed in the queue
+    socket.on('queue_updated', function(data) {
+        updateRequestCard(data);
+        setCounts(data.counts);
+        
+        if (data.old_status === null) {
+            const notice = document.getElementById('newRequestsNotice');
+            if (notice) {
+                newRequests += 1;
+                notice.querySelector('span').textContent = newRequests === 1
+                    ? `New request ${data.request_number} from ${data.user_name}.`
+                    : `${newRequests} new requests since this page was loaded.`;
+                notice.hidden = false;
+            }
+        }
+    });
+});
+
+/**
+ * Redraw the status badge of a request card, if it's on this page
+ */
+function updateRequestCard(data) {
+    const card = document.querySelector(`[data-request-id="${data.id}"]`);
+    if (!card) {
+        return;
+    }
+    
+    const badge = card.querySelector('[data-status-badge]');
+    if (badge) {
+        badge.className = `badge badge-${data.badge_class}`;
+        badge.textContent = data.status_display;
+    }
+    
+    // Only pending requests can be cancelled
+    const cancelForm = card.querySelector('[data-cancel-form]');
+    if (cancelForm && data.status !== 'pending') {
+        cancelForm.remove();
+    }
+}
+
+/**
+ * Add to one of the user's own dashboard counters
+ */
+function adjustStat(status, delta) {
+    if (!status) {
+        return;
+    }
+    
+    document.querySelectorAll(`[data-stat="${status}"]`).forEach(element => {
+        element.textContent = Math.max(0, parseInt(element.textContent, 10) + delta);
+    });
+}
+
+/**
+ * Set the queue-wide counters (filter tabs, navbar badge)
+ */
+function setCounts(counts) {
+    if (!counts) {
+        return;
+    }
+    
+    Object.entries(counts).forEach(([status, count]) => {
+        document.querySelectorAll(`[data-count="${status}"]`).forEach(element => {
+            element.textContent = count;
+            if (element.classList.contains('notification-badge')) {
+                element.hidden = count === 0;
+            }
+        });
+    });
+}
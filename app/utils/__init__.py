@@ -4,6 +4,8 @@ from app.utils.file_handler import (
     save_document,
     save_profile_picture,
     get_file_path,
+    send_document,
+    detect_page_count,
     delete_file,
     get_file_size,
     format_file_size
@@ -26,6 +28,8 @@ __all__ = [
     'save_document',
     'save_profile_picture',
     'get_file_path',
+    'send_document',
+    'detect_page_count',
     'delete_file',
     'get_file_size',
     'format_file_size',
@@ -0,0 +1,187 @@
+"""
+Profile picture sizes and formats
+
+An upload is stored once, as a square master JPEG. The sizes the pages
+actually show (a navbar icon, a card, the profile page) are made from it
+the first time each one is asked for, in the best format the browser
+accepts, and kept on disk next to the master. Pictures are named after a
+hash of their contents, so their URLs can be cached for good: a new
+picture gets a new URL. A replaced picture is kept until every worker's
+user cache has picked up the new one, so pages rendered with the old
+URL in the meantime still show a picture. JPEG decoding uses
+Image.draft so big photos are scaled down while they are decoded rather
+than decoded at full size and resized afterwards.
+"""
+import glob
+import io
+import os
+import re
+import tempfile
+
+from flask import current_app
+from PIL import Image, ImageOps, features
+
+from app.utils.jobs import enqueue, job_handler
+
+# Square sizes in pixels, twice the CSS size so they stay sharp on HiDPI screens
+AVATAR_SIZES = {
+    'small': 96,    # navbar, request lists (32-48px)
+    'medium': 160,  # admin user cards (80px)
+    'large': 360    # profile pages (180px)
+}
+MASTER_SIZE = AVATAR_SIZES['large']
+
+# Output formats, best first: (name, Pillow format, mimetype, save options)
+AVATAR_FORMATS = [
+    ('avif', 'AVIF', 'image/avif', {'quality': 60, 'speed': 8}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True})
+]
+
+# Stored pictures are named user_<id>_<first 16 hex chars of the SHA-256>.jpg,
+# so a name (and every URL made from it) always means the same picture
+AVATAR_NAME_RE = re.compile(r'^user_\d+_[0-9a-f]{16}$')
+
+# Browsers may keep a served picture for a year without asking again
+AVATAR_MAX_AGE = 365 * 24 * 60 * 60
+
+# Extra time a replaced picture is kept beyond USER_CACHE_TTL, in seconds
+AVATAR_RETIRE_GRACE = 60
+
+
+def _flatten(image):
+    """Put transparent images on a white background"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def make_master(file):
+    """
+    Turn an uploaded image into the square master JPEG
+
+    Args:
+        file: File-like object with the uploaded image
+
+    Returns:
+        bytes: JPEG data
+    """
+    image = Image.open(file)
+    # Let the JPEG decoder scale down by up to 8x while it decodes
+    image.draft('RGB', (MASTER_SIZE, MASTER_SIZE))
+    image = _flatten(ImageOps.exif_transpose(image))
+
+    side = min(MASTER_SIZE, *image.size)
+    image = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=90)
+    return output.getvalue()
+
+
+def get_avatar_folder():
+    """Get the folder profile pictures are stored in"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles')
+
+
+def choose_avatar_format(accept_mimetypes):
+    """
+    Pick the best image format the browser says it accepts
+
+    Args:
+        accept_mimetypes: request.accept_mimetypes
+
+    Returns:
+        tuple: Entry from AVATAR_FORMATS (JPEG if nothing better is accepted)
+    """
+    accepted = {mimetype for mimetype, quality in accept_mimetypes if quality > 0}
+    for entry in AVATAR_FORMATS:
+        if entry[2] in accepted and (entry[1] == 'JPEG' or features.check(entry[0])):
+            return entry
+    return AVATAR_FORMATS[-1]
+
+
+def get_avatar_variant(name, size, image_format):
+    """
+    Get the path of one size and format of a picture, making it if needed
+
+    Args:
+        name: Stored picture name without extension (user_<id>_<hex>)
+        size: Key of AVATAR_SIZES
+        image_format: Entry from AVATAR_FORMATS
+
+    Returns:
+        str: Absolute path, or None if the picture doesn't exist
+    """
+    ext, pil_format, _, options = image_format
+    folder = get_avatar_folder()
+    variant_path = os.path.join(folder, 'variants', f'{name}_{size}.{ext}')
+    if os.path.exists(variant_path):
+        return variant_path
+
+    master_path = os.path.join(folder, f'{name}.jpg')
+    if not os.path.exists(master_path):
+        return None
+
+    pixels = AVATAR_SIZES[size]
+    with Image.open(master_path) as image:
+        image.draft('RGB', (pixels, pixels))
+        image = image.convert('RGB')
+        image.thumbnail((pixels, pixels), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        # Write to a temporary file first so nobody is served half an image
+        os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant_path), suffix=f'.{ext}')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, pil_format, **options)
+            os.replace(tmp_path, variant_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    return variant_path
+
+
+def delete_avatar(relative_path):
+    """
+    Delete a stored picture and every size made from it
+
+    Args:
+        relative_path: Path stored in User.profile_picture
+    """
+    folder = get_avatar_folder()
+    name = os.path.splitext(os.path.basename(relative_path))[0]
+    paths = [os.path.join(folder, os.path.basename(relative_path))]
+    paths += glob.glob(os.path.join(folder, 'variants', f'{glob.escape(name)}_*'))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def retire_avatar(relative_path):
+    """
+    Delete a replaced picture once no worker can still be linking to it
+
+    Other workers keep the old picture name in their user cache for up to
+    USER_CACHE_TTL seconds, so the files are deleted by a job that runs
+    after that. Call this after committing the change.
+
+    Args:
+        relative_path: Path that was stored in User.profile_picture
+    """
+    delay = current_app.config['USER_CACHE_TTL'] + AVATAR_RETIRE_GRACE
+    enqueue('delete_avatar', {'relative_path': relative_path}, delay=delay)
+
+
+@job_handler('delete_avatar')
+def delete_unused_avatar(relative_path):
+    """Delete a retired picture unless someone has uploaded it again since"""
+    from app.models import User
+
+    if User.query.filter_by(profile_picture=relative_path).first() is None:
+        delete_avatar(relative_path)
@@ -0,0 +1,101 @@
+"""
+Change the status of many print requests at once
+"""
+from collections import Counter
+from datetime import datetime
+
+from app import db
+from app.utils.quotas import record_bulk_quota_change
+from app.utils.stats import REQUEST_STATUSES, bump_status_count
+from app.utils.workflow import get_allowed_transitions, record_events
+
+
+def bulk_update_status(request_ids, new_status, actor_id=None, note=None):
+    """
+    Move a set of requests to a new status in one transaction
+
+    The requests are read with one query, changed with a single
+    UPDATE ... WHERE id IN (...), and the status counters and quota
+    balances are adjusted once per status and balance row rather than
+    once per request. If any request can't make the transition, nothing
+    is changed.
+
+    Args:
+        request_ids: IDs of the requests to change
+        new_status: Status to move them to
+        actor_id: ID of the admin making the change (optional)
+        note: Note recorded with each change (optional)
+
+    Returns:
+        tuple: (success: bool, message: str, changed: list of dicts with
+               id, request_number, user_id, file_name, old_status)
+    """
+    from app.models import PrintRequest, User
+
+    if new_status not in REQUEST_STATUSES:
+        return False, 'Invalid status selected.', []
+
+    request_ids = set(request_ids)
+    if not request_ids:
+        return False, 'No requests selected.', []
+
+    rows = db.session.query(
+        PrintRequest.id,
+        PrintRequest.request_number,
+        PrintRequest.user_id,
+        PrintRequest.file_name,
+        PrintRequest.status,
+        PrintRequest.submitted_at,
+        (PrintRequest.number_of_pages * PrintRequest.number_of_copies).label('total_pages'),
+        User.faculty_department
+    ).join(User, PrintRequest.user_id == User.id)\
+        .filter(PrintRequest.id.in_(request_ids))\
+        .with_for_update(of=PrintRequest).all()
+
+    missing = request_ids - {row.id for row in rows}
+    if missing:
+        db.session.rollback()
+        return False, f'Requests not found: {", ".join(str(i) for i in sorted(missing))}', []
+
+    # Requests already in the target status are left alone
+    rows = [row for row in rows if row.status != new_status]
+    if not rows:
+        db.session.rollback()
+        return True, 'No requests needed changing.', []
+
+    blocked = [row.request_number for row in rows if new_status not in get_allowed_transitions(row.status)]
+    if blocked:
+        db.session.rollback()
+        return False, f'These requests cannot be moved to {new_status}: {", ".join(blocked)}', []
+
+    table = PrintRequest.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id.in_([row.id for row in rows]))
+        .values(status=new_status, updated_at=datetime.utcnow())
+    )
+
+    for old_status, count in Counter(row.status for row in rows).items():
+        bump_status_count(db.session, old_status, -count)
+    bump_status_count(db.session, new_status, len(rows))
+    record_events(db.session, [row.id for row in rows], {row.id: row.status for row in rows},
+                  new_status, actor_id, note)
+
+    record_bulk_quota_change(
+        db.session,
+        [(row.user_id, row.faculty_department, row.submitted_at, row.total_pages, row.status) for row in rows],
+        new_status
+    )
+    db.session.commit()
+
+    changed = [
+        {
+            'id': row.id,
+            'request_number': row.request_number,
+            'user_id': row.user_id,
+            'file_name': row.file_name,
+            'old_status': row.status
+        }
+        for row in rows
+    ]
+    return True, f'Updated {len(changed)} requests.', changed
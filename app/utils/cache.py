@@ -0,0 +1,140 @@
+"""
+Small key/value caches for hot, rarely-changing values
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class TTLCache:
+    """Process-local LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get a value, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every value"""
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """
+    Cache shared between worker processes through a SQLite file
+
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, path, ttl=60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        """Get a value, or default if it is missing or expired"""
+        row = self._connect().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value, ttl=None):
+        """Store a value"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at)
+            )
+
+    def delete(self, key):
+        """Remove a value if present"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        """Remove every value"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache')
+
+
+def init_cache(app):
+    """
+    Create the app's cache from config and register it on the app
+
+    Args:
+        app: Flask application
+    """
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+
+    if backend == 'sqlite':
+        path = app.config['CACHE_SQLITE_PATH']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cache = SQLiteCache(path, ttl=ttl)
+    else:
+        cache = TTLCache(ttl=ttl)
+
+    app.extensions['cache'] = cache
+    # Logged-in users are looked up on every request, so they stay in process
+    app.extensions['user_cache'] = TTLCache(
+        maxsize=app.config.get('USER_CACHE_SIZE', 1024),
+        ttl=app.config.get('USER_CACHE_TTL', 60)
+    )
+    return cache
+
+
+def get_cache():
+    """Get the current app's cache"""
+    return current_app.extensions['cache']
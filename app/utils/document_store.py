@@ -0,0 +1,188 @@
+"""
+Content-addressed storage for uploaded documents
+
+Documents are stored once per unique content under
+documents/blobs/<first two hex digits>/<sha256>, with a reference count in
+the document_blobs table. Uploading a file that is already stored only
+bumps its reference count.
+"""
+import hashlib
+import os
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.utils.upsert import upsert
+
+BLOB_PREFIX = os.path.join('documents', 'blobs')
+
+
+def blob_relative_path(file_hash):
+    """
+    Get the storage path of a blob, relative to UPLOAD_FOLDER
+
+    Args:
+        file_hash: SHA-256 hex digest of the contents
+
+    Returns:
+        str: Relative path stored in the database
+    """
+    return os.path.join(BLOB_PREFIX, file_hash[:2], file_hash)
+
+
+def is_blob_path(relative_path):
+    """Check whether a stored path points into the blob store"""
+    return os.path.normpath(relative_path).startswith(BLOB_PREFIX + os.sep)
+
+
+def get_incoming_folder():
+    """
+    Get the folder uploads are streamed into before being stored
+
+    It sits under UPLOAD_FOLDER so finished uploads can be renamed into
+    the blob store without copying.
+    """
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents', '.incoming')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def store_blob(temp_path, file_hash, size):
+    """
+    Move a fully written temp file into the store, or drop it if duplicate
+
+    The reference count change is added to the current session; the caller
+    commits it together with the row that references the blob.
+
+    Args:
+        temp_path: Absolute path of the finished upload
+        file_hash: SHA-256 hex digest of the contents
+        size: Size in bytes
+
+    Returns:
+        tuple: (relative_path: str, is_new: bool)
+    """
+    from app.models import DocumentBlob
+
+    relative_path = blob_relative_path(file_hash)
+    absolute_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+
+    # One atomic upsert, so two first uploads of the same file at once
+    # both end up counted instead of the second failing on the primary key
+    table = DocumentBlob.__table__
+    ref_count = upsert(
+        db.session, table,
+        {'sha256': file_hash, 'size': size, 'ref_count': 1},
+        {'ref_count': table.c.ref_count + 1},
+        returning=table.c.ref_count
+    )
+    is_new = ref_count == 1
+
+    if os.path.exists(absolute_path) and not is_new:
+        # Already on disk - this upload cost no extra space
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        os.replace(temp_path, absolute_path)
+
+    return relative_path, is_new
+
+
+def release_blob(relative_path):
+    """
+    Drop one reference to a blob, deleting it when nothing uses it
+
+    The count is decremented in the database in one statement, so an
+    upload of the same file at the same time is never lost. The file
+    itself is removed only once the transaction commits, and only if no
+    upload has brought the blob back by then.
+
+    Args:
+        relative_path: Blob path stored in the database
+
+    Returns:
+        bool: True if that was the last reference
+    """
+    from app.models import DocumentBlob
+
+    file_hash = os.path.basename(relative_path)
+    table = DocumentBlob.__table__
+    key = table.c.sha256 == file_hash
+    statement = table.update().where(key).values(ref_count=table.c.ref_count - 1)
+    if db.session.get_bind().dialect.update_returning:
+        ref_count = db.session.execute(statement.returning(table.c.ref_count)).scalar()
+    else:
+        db.session.execute(statement)
+        ref_count = db.session.execute(select(table.c.ref_count).where(key)).scalar()
+    if ref_count is None or ref_count > 0:
+        return False
+
+    db.session.execute(table.delete().where(key & (table.c.ref_count <= 0)))
+    absolute_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    db.session.info.setdefault('released_blobs', {})[file_hash] = absolute_path
+    return True
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _remove_released_blobs(session):
+    """Delete the files of blobs whose last reference was just committed"""
+    from app.models import DocumentBlob
+
+    released = session.info.pop('released_blobs', None)
+    if not released:
+        return
+
+    # The session can't run queries while it commits, so check on a
+    # connection of its own that no upload has stored the blob again
+    table = DocumentBlob.__table__
+    with session.get_bind().connect() as connection:
+        stored_again = set(connection.scalars(
+            select(table.c.sha256).where(table.c.sha256.in_(list(released)))
+        ))
+    for file_hash, absolute_path in released.items():
+        if file_hash not in stored_again and os.path.exists(absolute_path):
+            os.remove(absolute_path)
+
+
+@db.event.listens_for(Session, 'after_soft_rollback')
+def _keep_released_blobs(session, previous_transaction):
+    """A rolled back release keeps its file"""
+    if previous_transaction.parent is None:
+        session.info.pop('released_blobs', None)
+
+
+def hash_file(path, chunk_size=64 * 1024):
+    """
+    Compute the SHA-256 of a file on disk without reading it all at once
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def import_legacy_file(relative_path):
+    """
+    Move a file saved before the blob store existed into the store
+
+    Args:
+        relative_path: Old per-user path stored in the database
+
+    Returns:
+        tuple: (new_relative_path: str, file_hash: str, reclaimed_bytes: int),
+               or None if the file is missing
+    """
+    absolute_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+    if not os.path.exists(absolute_path):
+        return None
+
+    size = os.path.getsize(absolute_path)
+    file_hash = hash_file(absolute_path)
+    new_path, is_new = store_blob(absolute_path, file_hash, size)
+    return new_path, file_hash, 0 if is_new else size
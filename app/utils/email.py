@@ -1,146 +1,210 @@
-from flask import current_app
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from jinja2 import TemplateNotFound
 from flask_mail import Mail, Message
-from threading import Thread
+from app import db
+from app.utils.jobs import job_handler, enqueue
+from app.utils.mail_pool import get_mail_dispatcher
 
 mail = Mail()
 
+ADMIN_DIGEST = 'new_requests'
 
-def send_async_email(app, msg):
-    """Send email in background thread so it doesn't block"""
-    with app.app_context():
-        try:
-            mail.send(msg)
-        except Exception as e:
-            current_app.logger.error(f'Email failed: {str(e)}')
+# Requests submitted this recently are left for the next digest, so one
+# still being committed when the digest runs isn't skipped
+DIGEST_SETTLE_SECONDS = 10
 
 
-def send_email(subject, recipients, text_body, html_body=None):
+@job_handler('send_email')
+def deliver_email(subject, recipients, text_body, html_body=None):
     """
-    Send an email to one or more recipients
+    Actually send an email (runs in the job worker)
+
+    Goes through the process's SMTP pool so concurrent jobs share open
+    connections; an SMTP error is raised here so the job is retried.
     """
-    if current_app.config.get('MAIL_SUPPRESS_SEND'):
-        current_app.logger.info(f'Email suppressed: {subject} to {recipients}')
-        return
-    
     msg = Message(
         subject=subject,
         recipients=recipients,
         body=text_body,
         html=html_body
     )
-    
-    # send in background thread
-    Thread(
-        target=send_async_email,
-        args=(current_app._get_current_object(), msg)
-    ).start()
+    get_mail_dispatcher(current_app._get_current_object(), mail).send(msg)
 
 
-def send_status_update_email(user, print_request, old_status, new_status):
+def send_email(subject, recipients, text_body, html_body=None):
     """
-    Notify user when their print request status changes
+    Send an email to one or more recipients
+    
+    The email is queued and sent by the job worker, so SMTP is never
+    in the request path. Failed sends are retried.
     """
-    subject = f'Print Request #{print_request.id} - Status Update'
+    if current_app.config.get('MAIL_SUPPRESS_SEND'):
+        current_app.logger.info(f'Email suppressed: {subject} to {recipients}')
+        return
     
-    # build the email body
-    text_body = f"""Hi {user.name},
+    enqueue('send_email', {
+        'subject': subject,
+        'recipients': list(recipients),
+        'text_body': text_body,
+        'html_body': html_body
+    })
 
-Your print request has been updated:
 
-Request ID: #{print_request.id}
-Document: {print_request.document_name}
-Status: {old_status.replace('_', ' ').title()} → {new_status.replace('_', ' ').title()}
+def render_email(template, **context):
+    """
+    Render the text and HTML bodies of an email from templates/email/
 
-"""
-    
-    if new_status == 'approved':
-        text_body += "Good news! Your request has been approved.\n\n"
-    elif new_status == 'rejected':
-        text_body += f"Your request was rejected.\nReason: {print_request.admin_notes or 'No reason provided'}\n\n"
-    elif new_status == 'completed':
-        text_body += "Your print job is ready for pickup!\n\n"
-    elif new_status == 'in_progress':
-        text_body += "Your request is being processed.\n\n"
-    
-    text_body += f"""Details:
-- Pages: {print_request.num_pages}
-- Copies: {print_request.num_copies}
-- Color: {'Yes' if print_request.color else 'No'}
-- Double-sided: {'Yes' if print_request.double_sided else 'No'}
-
-Thanks,
-Print Request System
-"""
-    
-    # HTML version looks nicer
-    status_color = {
-        'approved': '#27ae60',
-        'completed': '#17a2b8',
-        'rejected': '#e74c3c',
-        'in_progress': '#f39c12'
-    }.get(new_status, '#6c757d')
-    
-    html_body = f"""
-<html>
-<body style="font-family: Arial, sans-serif; color: #333;">
-    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-        <h2 style="color: #2c3e50;">Print Request Status Update</h2>
-        
-        <p>Hi <strong>{user.name}</strong>,</p>
-        
-        <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
-            <p><strong>Request ID:</strong> #{print_request.id}</p>
-            <p><strong>Document:</strong> {print_request.document_name}</p>
-            <p><strong>Status:</strong> 
-                <span style="color: {status_color}; font-weight: bold;">
-                    {new_status.replace('_', ' ').title()}
-                </span>
-            </p>
-        </div>
-"""
-    
-    if new_status == 'approved':
-        html_body += '<div style="background: #d4edda; padding: 15px; margin: 20px 0; border-left: 4px solid #28a745;"><p style="margin: 0; color: #155724;">✓ Good news! Your request has been approved.</p></div>'
-    elif new_status == 'rejected':
-        html_body += f'<div style="background: #f8d7da; padding: 15px; margin: 20px 0; border-left: 4px solid #dc3545;"><p style="margin: 0; color: #721c24;">✗ Request rejected<br>Reason: {print_request.admin_notes or "No reason provided"}</p></div>'
-    elif new_status == 'completed':
-        html_body += '<div style="background: #d1ecf1; padding: 15px; margin: 20px 0; border-left: 4px solid #17a2b8;"><p style="margin: 0; color: #0c5460;">✓ Your print job is ready for pickup!</p></div>'
-    
-    html_body += f"""
-        <h3>Details</h3>
-        <ul>
-            <li>Pages: {print_request.num_pages}</li>
-            <li>Copies: {print_request.num_copies}</li>
-            <li>Color: {'Yes' if print_request.color else 'No'}</li>
-            <li>Double-sided: {'Yes' if print_request.double_sided else 'No'}</li>
-        </ul>
-        
-        <p style="color: #6c757d; font-size: 14px; margin-top: 30px;">
-            Thanks,<br>
-            Print Request System
-        </p>
-    </div>
-</body>
-</html>
-"""
-    
+    Templates are compiled once and cached by the Jinja environment, so
+    each send only fills in the per-request fields.
+
+    Args:
+        template: Base name, e.g. 'status_update' for status_update.txt/.html
+        **context: Template variables
+
+    Returns:
+        tuple: (text_body: str, html_body: str or None if there's no HTML version)
+    """
+    text_body = render_template(f'email/{template}.txt', **context)
+    try:
+        html_body = render_template(f'email/{template}.html', **context)
+    except TemplateNotFound:
+        html_body = None
+    return text_body, html_body
+
+
+def send_status_update_email(user, print_request, old_status, new_status, admin_notes=None):
+    """
+    Notify user when their print request status changes
+    """
+    subject = f'Print Request {print_request.request_number} - Status Update'
+    text_body, html_body = render_email(
+        'status_update',
+        user=user,
+        print_request=print_request,
+        old_status=old_status,
+        new_status=new_status,
+        admin_notes=admin_notes
+    )
     send_email(subject, [user.email], text_body, html_body)
 
 
+def send_bulk_status_emails(changed, new_status, admin_notes=None):
+    """
+    Send each affected user one email covering all their changed requests
+
+    Args:
+        changed: List from bulk_update_status
+        new_status: Status the requests moved to
+        admin_notes: Note from the admin to include (optional)
+    """
+    from app.models import User
+
+    by_user = {}
+    for change in changed:
+        by_user.setdefault(change['user_id'], []).append(change)
+
+    users = User.query.filter(User.id.in_(by_user)).all()
+    for user in users:
+        changes = by_user[user.id]
+        if len(changes) == 1:
+            subject = f'Print Request {changes[0]["request_number"]} - Status Update'
+        else:
+            subject = f'{len(changes)} Print Requests - Status Update'
+        text_body, html_body = render_email(
+            'bulk_status_update',
+            user=user,
+            changes=changes,
+            new_status=new_status,
+            admin_notes=admin_notes
+        )
+        send_email(subject, [user.email], text_body, html_body)
+
+
 def send_new_request_notification(admin_emails, print_request, user):
     """Let admins know about new print requests"""
     subject = f'New Print Request from {user.name}'
-    
-    text_body = f"""New print request submitted:
+    text_body, html_body = render_email('new_request', print_request=print_request, user=user)
+    send_email(subject, admin_emails, text_body, html_body)
 
-ID: #{print_request.id}
-From: {user.name} ({user.email})
-Department: {user.faculty_department}
-Document: {print_request.document_name}
-Pages: {print_request.num_pages}
-Copies: {print_request.num_copies}
 
-Please review in the admin dashboard.
-"""
-    
-    send_email(subject, admin_emails, text_body)
+def get_admin_emails():
+    """Get the email addresses of all admins"""
+    from app.models import User
+    return [email for (email,) in db.session.query(User.email).filter(User.is_admin.is_(True))]
+
+
+def notify_new_request(print_request, user):
+    """
+    Tell admins about a new print request
+
+    With ADMIN_DIGEST_INTERVAL set, nothing is sent now; the request is
+    included in the next digest email instead.
+    """
+    if current_app.config['ADMIN_DIGEST_INTERVAL']:
+        schedule_admin_digest()
+        return
+
+    admin_emails = get_admin_emails()
+    if admin_emails:
+        send_new_request_notification(admin_emails, print_request, user)
+
+
+def schedule_admin_digest():
+    """
+    Make sure a digest job is waiting to run
+
+    Returns:
+        Job: The queued digest job
+    """
+    from app.models import Job
+
+    job = Job.query.filter_by(kind='send_admin_digest', status='queued').first()
+    if job is None:
+        job = enqueue('send_admin_digest', delay=current_app.config['ADMIN_DIGEST_INTERVAL'])
+    return job
+
+
+@job_handler('send_admin_digest')
+def send_admin_digest():
+    """
+    Email admins one summary of the requests submitted since the last digest
+
+    Reschedules itself while requests keep coming in; once a window passes
+    with none, the next new request schedules it again. Requests from the
+    last DIGEST_SETTLE_SECONDS are left for the next digest, which is
+    scheduled for them here: while this job was queued, their own
+    submissions saw it and didn't schedule one.
+    """
+    from sqlalchemy.orm import joinedload
+    from app.models import NotificationDigest, PrintRequest
+
+    until = datetime.utcnow() - timedelta(seconds=DIGEST_SETTLE_SECONDS)
+    state = db.session.get(NotificationDigest, ADMIN_DIGEST)
+    if state is None:
+        state = NotificationDigest(name=ADMIN_DIGEST, last_sent_at=until - timedelta(
+            seconds=current_app.config['ADMIN_DIGEST_INTERVAL']))
+        db.session.add(state)
+    since = state.last_sent_at
+
+    print_requests = PrintRequest.query.options(joinedload(PrintRequest.user))\
+        .filter(PrintRequest.submitted_at > since, PrintRequest.submitted_at <= until)\
+        .order_by(PrintRequest.submitted_at, PrintRequest.id).all()
+
+    # Committed together with the email job below, so a digest is never sent twice
+    state.last_sent_at = until
+
+    if print_requests:
+        admin_emails = get_admin_emails()
+        if admin_emails:
+            count = len(print_requests)
+            subject = f'{count} New Print Request{"" if count == 1 else "s"}'
+            text_body, html_body = render_email('admin_digest', print_requests=print_requests, since=since)
+            send_email(subject, admin_emails, text_body, html_body)
+
+    newer = db.session.query(PrintRequest.query.filter(PrintRequest.submitted_at > until).exists()).scalar()
+    if print_requests or newer:
+        schedule_admin_digest()
+
+    db.session.commit()
@@ -1,9 +1,17 @@
+import hashlib
 import os
 import secrets
+import tempfile
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from PIL import Image
-from flask import current_app
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from flask import current_app, request
+from app.utils.avatars import get_avatar_folder, make_master
+from app.utils.document_store import get_incoming_folder, store_blob, release_blob, is_blob_path
+from app.utils.jobs import job_handler
+from app.utils.pdf_info import count_pdf_pages, get_pdf_page_sizes, summarize_page_sizes
+
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def allowed_file(filename, allowed_extensions):
@@ -38,54 +46,128 @@ def generate_unique_filename(original_filename):
     return f"{timestamp}_{random_string}"
 
 
+def stream_upload(file, directory, max_size_bytes):
+    """
+    Stream an upload into a temporary file in fixed-size chunks
+    
+    Only one chunk is held in memory at a time. The size limit is enforced
+    and the SHA-256 hash computed as the bytes go past.
+    
+    Args:
+        file: FileStorage object from request.files
+        directory: Directory for the temporary file (same filesystem as
+            the final location, so it can be renamed into place)
+        max_size_bytes: Largest allowed upload
+    
+    Returns:
+        tuple: (temp_path: str, size: int, sha256: str)
+    
+    Raises:
+        ValueError: If the upload is larger than max_size_bytes
+    """
+    stream = file.stream
+    if stream.seekable():
+        stream.seek(0)
+    
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size_bytes:
+                    raise ValueError(f"File size exceeds {max_size_bytes // (1024 * 1024)}MB limit")
+                digest.update(chunk)
+                temp_file.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    
+    return temp_path, size, digest.hexdigest()
+
+
 def save_document(file, user_id):
     """
-    Save uploaded document file
+    Save uploaded document file in the content-addressed store
     
     Args:
         file: FileStorage object from request.files
         user_id: ID of the user uploading the file
     
     Returns:
-        tuple: (success: bool, message: str, file_path: str or None)
+        tuple: (success: bool, message: str, file_path: str or None,
+                file_hash: str or None)
     """
     if not file:
-        return False, "No file provided", None
+        return False, "No file provided", None, None
     
     # Check if file has a filename
     if file.filename == '':
-        return False, "No file selected", None
+        return False, "No file selected", None, None
     
     # Validate file extension
     allowed_extensions = current_app.config['ALLOWED_DOCUMENT_EXTENSIONS']
     if not allowed_file(file.filename, allowed_extensions):
-        return False, f"Invalid file type. Allowed types: {', '.join(allowed_extensions)}", None
-    
-    # Validate file size
-    if not validate_file_size(file, max_size_mb=50):
-        return False, "File size exceeds 50MB limit", None
+        return False, f"Invalid file type. Allowed types: {', '.join(allowed_extensions)}", None, None
     
     try:
-        # Generate unique filename
-        original_filename = secure_filename(file.filename)
-        unique_filename = generate_unique_filename(original_filename)
+        # Stream to a temp file, checking the size limit as we go
+        temp_path, size, file_hash = stream_upload(
+            file, get_incoming_folder(), max_size_bytes=50 * 1024 * 1024
+        )
         
-        # Create user-specific directory
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        user_folder = os.path.join(upload_folder, 'documents', str(user_id))
-        os.makedirs(user_folder, exist_ok=True)
+        # Store by content - a duplicate upload just adds a reference
+        relative_path, _ = store_blob(temp_path, file_hash, size)
         
-        # Save file
-        file_path = os.path.join(user_folder, unique_filename)
-        file.save(file_path)
-        
-        # Return relative path for database storage
-        relative_path = os.path.join('documents', str(user_id), unique_filename)
-        
-        return True, "File uploaded successfully", relative_path
+        return True, "File uploaded successfully", relative_path, file_hash
         
+    except ValueError as e:
+        return False, str(e), None, None
     except Exception as e:
-        return False, f"Error saving file: {str(e)}", None
+        return False, f"Error saving file: {str(e)}", None, None
+
+
+def detect_page_count(relative_path, filename):
+    """
+    Read the page count of a stored document
+    
+    Args:
+        relative_path: Relative path stored in database
+        filename: Original filename (used to tell PDFs apart)
+    
+    Returns:
+        int: Page count, or None if it can't be read from this file type
+    """
+    if not allowed_file(filename, {'pdf'}):
+        return None
+    return count_pdf_pages(get_file_path(relative_path))
+
+
+@job_handler('analyze_document')
+def analyze_document(request_id):
+    """
+    Record the page size of a request's document
+    
+    Walks every page object, so it runs as a background job after the
+    request has been saved.
+    
+    Args:
+        request_id: ID of the PrintRequest to analyze
+    """
+    from app import db
+    from app.models import PrintRequest
+    
+    print_request = db.session.get(PrintRequest, request_id)
+    if print_request is None or not allowed_file(print_request.file_name, {'pdf'}):
+        return
+    
+    sizes = get_pdf_page_sizes(get_file_path(print_request.file_path))
+    print_request.detected_page_size = summarize_page_sizes(sizes)
+    db.session.commit()
 
 
 def save_profile_picture(file, user_id):
@@ -115,32 +197,19 @@ def save_profile_picture(file, user_id):
         return False, "Image size exceeds 5MB limit", None
     
     try:
-        # Generate unique filename
-        unique_filename = f"user_{user_id}_{secrets.token_hex(8)}.jpg"
+        # Make the square master; display sizes are made from it on demand
+        master = make_master(file)
+        
+        # Name it after its contents so its URLs never change meaning
+        unique_filename = f"user_{user_id}_{hashlib.sha256(master).hexdigest()[:16]}.jpg"
         
         # Create profiles directory
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        profiles_folder = os.path.join(upload_folder, 'profiles')
+        profiles_folder = get_avatar_folder()
         os.makedirs(profiles_folder, exist_ok=True)
         
         file_path = os.path.join(profiles_folder, unique_filename)
-        
-        # Open and process image
-        image = Image.open(file)
-        
-        # Convert to RGB if necessary (handles PNG with transparency)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        
-        # Resize to 200x200 (square)
-        image = image.resize((200, 200), Image.Resampling.LANCZOS)
-        
-        # Save as JPEG
-        image.save(file_path, 'JPEG', quality=85, optimize=True)
+        with open(file_path, 'wb') as f:
+            f.write(master)
         
         # Return relative path for database storage
         relative_path = os.path.join('profiles', unique_filename)
@@ -165,6 +234,51 @@ def get_file_path(relative_path):
     return os.path.join(upload_folder, relative_path)
 
 
+def send_document(relative_path, download_name, file_hash=None):
+    """
+    Build a download response for a stored document
+    
+    The content hash is used as a strong ETag, so repeat downloads of an
+    unchanged file get a 304, and Range requests get a 206 for the parts
+    asked for. If X_ACCEL_REDIRECT_PREFIX (nginx) or USE_X_SENDFILE
+    (Apache/lighttpd) is configured, the front server streams the file and
+    handles ranges instead of the worker.
+    
+    Args:
+        relative_path: Relative path stored in database
+        download_name: Filename the browser should save as
+        file_hash: SHA-256 of the contents (optional, for the ETag)
+    
+    Returns:
+        Response: File download response
+    """
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    offload = bool(accel_prefix or current_app.config.get('USE_X_SENDFILE'))
+    
+    response = werkzeug_send_file(
+        get_file_path(relative_path),
+        request.environ,
+        as_attachment=True,
+        download_name=download_name,
+        etag=file_hash or True,
+        # The front server handles ranges for offloaded files
+        conditional=not offload,
+        use_x_sendfile=offload,
+        response_class=current_app.response_class
+    )
+    
+    if offload:
+        response = response.make_conditional(request.environ, accept_ranges=False)
+        if response.status_code == 304:
+            response.headers.pop('X-Sendfile', None)
+        elif accel_prefix:
+            response.headers.pop('X-Sendfile', None)
+            internal_path = relative_path.replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{internal_path}"
+    
+    return response
+
+
 def delete_file(relative_path):
     """
     Delete a file from storage
@@ -176,6 +290,10 @@ def delete_file(relative_path):
         bool: True if deleted successfully, False otherwise
     """
     try:
+        # Shared documents are only removed once nothing references them
+        if is_blob_path(relative_path):
+            return release_blob(relative_path)
+        
         file_path = get_file_path(relative_path)
         if os.path.exists(file_path):
             os.remove(file_path)
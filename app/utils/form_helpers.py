@@ -3,6 +3,14 @@ Helper functions for form rendering and validation
 """
 from flask import flash
 
+# Cost per printed page by print format and paper size
+PRICE_PER_PAGE = {
+    'bw': {'A4': 0.05, 'A3': 0.10, 'A5': 0.03},
+    'color': {'A4': 0.25, 'A3': 0.50, 'A5': 0.15}
+}
+DEFAULT_PRICE_PER_PAGE = 0.05
+DOUBLE_SIDED_FACTOR = 0.6  # 40% discount for double-sided (saves paper)
+
 
 def flash_form_errors(form):
     """
@@ -71,9 +79,14 @@ def validate_print_request_data(form_data):
     return len(errors) == 0, errors
 
 
+def get_price_per_page(print_format, paper_size):
+    """Look up the cost of one printed page"""
+    return PRICE_PER_PAGE.get(print_format, {}).get(paper_size, DEFAULT_PRICE_PER_PAGE)
+
+
 def calculate_print_cost(number_of_pages, number_of_copies, print_format, paper_size, is_double_sided):
     """
-    Calculate estimated print cost (for future use)
+    Calculate estimated print cost
     
     Args:
         number_of_pages: Number of pages in document
@@ -85,21 +98,15 @@ def calculate_print_cost(number_of_pages, number_of_copies, print_format, paper_
     Returns:
         float: Estimated cost
     """
-    # Base costs per page
-    base_costs = {
-        'bw': {'A4': 0.05, 'A3': 0.10, 'A5': 0.03},
-        'color': {'A4': 0.25, 'A3': 0.50, 'A5': 0.15}
-    }
-    
     # Get base cost
-    cost_per_page = base_costs.get(print_format, {}).get(paper_size, 0.05)
+    cost_per_page = get_price_per_page(print_format, paper_size)
     
     # Calculate total pages
     total_pages = number_of_pages * number_of_copies
     
     # Apply double-sided discount (saves paper)
     if is_double_sided:
-        total_pages = total_pages * 0.6  # 40% discount for double-sided
+        total_pages = total_pages * DOUBLE_SIDED_FACTOR
     
     return round(total_pages * cost_per_page, 2)
 
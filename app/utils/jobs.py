@@ -0,0 +1,247 @@
+"""
+Durable background job queue
+
+Jobs are rows in the jobs table, so they survive restarts and are shared
+by every web worker. `flask worker` runs a pool of threads that claim due
+jobs, run the registered handler, and retry failures with exponential
+backoff.
+"""
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+
+# Job kind -> handler function, filled in by @job_handler
+_handlers = {}
+
+
+def job_handler(kind):
+    """
+    Register a function as the handler for a kind of job
+
+    The job's payload is passed to the handler as keyword arguments.
+    """
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=None):
+    """
+    Add a job to the queue
+
+    With JOBS_RUN_INLINE set (e.g. in tests) the handler runs immediately
+    instead.
+
+    Args:
+        kind: Registered job kind
+        payload: JSON-serializable dict passed to the handler
+        delay: Seconds to wait before the job may run
+        max_attempts: Tries before giving up (defaults to JOB_MAX_ATTEMPTS)
+
+    Returns:
+        Job: The queued job, or None if it ran inline
+    """
+    from app.models import Job
+
+    if kind not in _handlers:
+        raise ValueError(f'No handler registered for job kind {kind!r}')
+
+    if current_app.config.get('JOBS_RUN_INLINE'):
+        _handlers[kind](**(payload or {}))
+        return None
+
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically take the next due job
+
+    Returns:
+        Job: The claimed job (now 'running'), or None if nothing is due
+    """
+    from app.models import Job
+
+    now = datetime.utcnow()
+    candidates = Job.query.filter(Job.status == 'queued', Job.run_at <= now)\
+        .order_by(Job.run_at, Job.id).limit(5).all()
+
+    for job in candidates:
+        # Only one worker can win the queued -> running update
+        claimed = Job.query.filter_by(id=job.id, status='queued').update({
+            'status': 'running',
+            'started_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job
+    return None
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome
+
+    Failed jobs are re-queued with exponential backoff until they reach
+    max_attempts.
+
+    Args:
+        job: Job returned by claim_next_job
+    """
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f'No handler registered for job kind {job.kind!r}')
+        handler(**job.payload)
+    except Exception:
+        db.session.rollback()
+        job.last_error = traceback.format_exc(limit=5)
+        if job.attempts < job.max_attempts:
+            backoff = current_app.config['JOB_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        current_app.logger.warning(f'Job {job.id} ({job.kind}) failed, attempt {job.attempts}')
+    else:
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        current_app.logger.info(
+            f'Job {job.id} ({job.kind}) done: waited {job.wait_seconds:.2f}s, ran {job.run_seconds:.2f}s'
+        )
+    db.session.commit()
+
+
+def requeue_stale_jobs(timeout):
+    """
+    Put back jobs left 'running' by a worker that died
+
+    Args:
+        timeout: Seconds after which a running job is considered abandoned
+
+    Returns:
+        int: Number of jobs re-queued
+    """
+    from app.models import Job
+
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    count = Job.query.filter(Job.status == 'running', Job.started_at < cutoff)\
+        .update({'status': 'queued', 'run_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def purge_finished_jobs(older_than_days):
+    """
+    Delete finished jobs older than a number of days
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    from app.models import Job
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    count = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff)\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def get_job_stats(since=None):
+    """
+    Summarize queue latency and run time per job kind
+
+    Args:
+        since: Only include jobs created after this datetime (optional)
+
+    Returns:
+        dict: Kind -> {'done', 'failed', 'queued', 'avg_wait', 'p95_wait',
+              'avg_run', 'p95_run'} (times in seconds)
+    """
+    from app.models import Job
+
+    query = Job.query
+    if since is not None:
+        query = query.filter(Job.created_at >= since)
+
+    stats = {}
+    for job in query.yield_per(500):
+        kind = stats.setdefault(job.kind, {
+            'done': 0, 'failed': 0, 'queued': 0, 'running': 0, 'waits': [], 'runs': []
+        })
+        kind[job.status] += 1
+        if job.status == 'done':
+            kind['waits'].append(job.wait_seconds)
+            kind['runs'].append(job.run_seconds)
+
+    for kind in stats.values():
+        for name, values in (('wait', kind.pop('waits')), ('run', kind.pop('runs'))):
+            values.sort()
+            kind[f'avg_{name}'] = sum(values) / len(values) if values else 0.0
+            kind[f'p95_{name}'] = values[int(len(values) * 0.95)] if values else 0.0
+    return stats
+
+
+def run_worker(app, concurrency=None, poll_interval=None, stop_event=None):
+    """
+    Process jobs with a fixed pool of threads until interrupted
+
+    Args:
+        app: Flask application
+        concurrency: Number of worker threads (defaults to JOB_WORKER_THREADS)
+        poll_interval: Seconds to sleep when the queue is empty
+        stop_event: threading.Event that stops the workers when set
+    """
+    concurrency = concurrency or app.config['JOB_WORKER_THREADS']
+    poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+    stop_event = stop_event or threading.Event()
+
+    with app.app_context():
+        requeued = requeue_stale_jobs(app.config['JOB_TIMEOUT'])
+        purge_finished_jobs(app.config['JOB_RETENTION_DAYS'])
+        if requeued:
+            app.logger.warning(f'Re-queued {requeued} abandoned jobs')
+
+    def work():
+        while not stop_event.is_set():
+            with app.app_context():
+                try:
+                    job = claim_next_job()
+                    if job is not None:
+                        run_job(job)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f'Job worker error: {str(e)}')
+                    job = None
+            if job is None:
+                stop_event.wait(poll_interval)
+
+    threads = [threading.Thread(target=work, name=f'job-worker-{i}', daemon=True)
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
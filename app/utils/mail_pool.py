@@ -0,0 +1,151 @@
+"""
+Pooled SMTP sending
+
+A fixed number of sender threads each keep one SMTP connection open and
+reuse it for every message they send, instead of connecting, doing the
+TLS handshake and logging in once per email. Messages that are waiting
+when a sender becomes free are sent back to back as one batch on that
+connection. The queue in front of the senders is bounded, so a flood of
+emails slows producers down instead of piling up in memory.
+"""
+import os
+import queue
+import smtplib
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+_dispatcher_lock = threading.Lock()
+
+
+class MailQueueFull(RuntimeError):
+    """Raised when the send queue stays full for longer than the timeout"""
+
+
+class MailDispatcher:
+    """Fixed pool of SMTP sender threads with persistent connections"""
+
+    def __init__(self, app, mail, workers=2, queue_size=100, batch_size=20, idle_timeout=30):
+        self.app = app
+        self.mail = mail
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._run, name=f'smtp-sender-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, msg, timeout=10):
+        """
+        Queue a message for sending
+
+        Args:
+            msg: flask_mail.Message
+            timeout: Seconds to wait for room in the queue
+
+        Returns:
+            Future: Resolves to None once sent, or to the SMTP error
+
+        Raises:
+            MailQueueFull: If the queue is still full after timeout
+        """
+        future = Future()
+        try:
+            self._queue.put((msg, future), timeout=timeout)
+        except queue.Full:
+            raise MailQueueFull('Email queue is full')
+        return future
+
+    def send(self, msg, timeout=60):
+        """
+        Send a message through the pool and wait for the result
+
+        Raises:
+            MailQueueFull: If the message wasn't picked up within timeout;
+                           it has then been taken off the queue, so a retry
+                           won't send it twice
+        """
+        future = self.submit(msg)
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise MailQueueFull('Email was not sent in time') from None
+            # Already on the wire - wait for the SMTP conversation to finish
+            future.result()
+
+    def _next_batch(self):
+        """Wait for a message, then take whatever else is already waiting"""
+        batch = [self._queue.get(timeout=self.idle_timeout)]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            connection = None
+            while True:
+                try:
+                    batch = self._next_batch()
+                except queue.Empty:
+                    # Idle - don't hold the connection open until the server drops it
+                    connection = self._close(connection)
+                    continue
+
+                for msg, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        connection = self._send(connection, msg)
+                    except Exception as e:
+                        connection = self._close(connection)
+                        future.set_exception(e)
+                    else:
+                        future.set_result(None)
+
+    def _send(self, connection, msg):
+        """Send on the open connection, reconnecting once if it was dropped"""
+        if connection is None:
+            connection = self.mail.connect().__enter__()
+        try:
+            connection.send(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._close(connection)
+            connection = self.mail.connect().__enter__()
+            connection.send(msg)
+        return connection
+
+    def _close(self, connection):
+        """Close a connection, ignoring errors from an already dead socket"""
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+        return None
+
+
+def get_mail_dispatcher(app, mail):
+    """
+    Get this process's dispatcher, starting it on first use
+
+    Created lazily so forked worker processes each start their own threads.
+    """
+    with _dispatcher_lock:
+        dispatcher = app.extensions.get('mail_dispatcher')
+        if dispatcher is None or dispatcher[0] != os.getpid():
+            dispatcher = (os.getpid(), MailDispatcher(
+                app,
+                mail,
+                workers=app.config['MAIL_POOL_SIZE'],
+                queue_size=app.config['MAIL_QUEUE_SIZE'],
+                batch_size=app.config['MAIL_BATCH_SIZE'],
+                idle_timeout=app.config['MAIL_IDLE_TIMEOUT']
+            ))
+            app.extensions['mail_dispatcher'] = dispatcher
+        return dispatcher[1]
@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination for print request lists
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(print_request):
+    """
+    Build an opaque cursor pointing just after a request
+
+    Args:
+        print_request: Last PrintRequest shown on the current page
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = f'{print_request.submitted_at.isoformat()}|{print_request.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from the query string
+
+    Returns:
+        tuple: (submitted_at: datetime, id: int), or None if invalid
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        submitted_at, request_id = raw.split('|')
+        return datetime.fromisoformat(submitted_at), int(request_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def paginate_requests(query, cursor=None, per_page=None):
+    """
+    Fetch one page of requests, newest first, using keyset pagination
+
+    Seeks past the cursor on (submitted_at, id) instead of using OFFSET,
+    so every page is a single index range scan no matter how deep it is.
+
+    Args:
+        query: PrintRequest query with any filters already applied
+        cursor: Cursor from the previous page (optional)
+        per_page: Page size (defaults to REQUESTS_PER_PAGE)
+
+    Returns:
+        tuple: (items: list, next_cursor: str or None)
+    """
+    from app.models import PrintRequest
+
+    if per_page is None:
+        per_page = current_app.config['REQUESTS_PER_PAGE']
+
+    position = decode_cursor(cursor)
+    if position:
+        submitted_at, request_id = position
+        query = query.filter(or_(
+            PrintRequest.submitted_at < submitted_at,
+            and_(PrintRequest.submitted_at == submitted_at, PrintRequest.id < request_id)
+        ))
+
+    # Fetch one extra row to find out whether there is another page
+    items = query.order_by(PrintRequest.submitted_at.desc(), PrintRequest.id.desc())\
+        .limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1])
+
+    return items, next_cursor
@@ -0,0 +1,204 @@
+"""
+Password hashing off the request thread
+
+Hashing a password is deliberately slow (hundreds of milliseconds of CPU),
+so doing it inline in the login view stalls everything else the worker
+is serving. Hashes are computed in a small process pool instead, with a
+cap on how many may be waiting so a login rush queues up rather than
+piling up without limit. Under eventlet (the Procfile's web worker) a
+process pool hangs on the monkey-patched threads it relies on, so there
+the work goes to eventlet's real-thread pool (tpool) instead, sized to
+PASSWORD_HASH_WORKERS threads; hashlib releases the GIL while hashing,
+so other greenlets keep being served.
+The method and cost come from config; hashes made with older settings
+are upgraded the next time their owner logs in.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+_hasher_lock = threading.Lock()
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hashes are already waiting for the pool"""
+
+
+def normalize_method(method):
+    """
+    Spell out a hashing method with all its cost parameters
+
+    Werkzeug fills in defaults for missing parameters, so 'scrypt' and
+    'scrypt:32768:8:1' produce the same hashes. Comparing the full form
+    with the prefix stored in a hash tells whether it needs redoing.
+
+    Args:
+        method: 'scrypt[:n:r:p]' or 'pbkdf2[:hash_name[:iterations]]'
+
+    Returns:
+        str: e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:1000000'
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = (args + ['32768', '8', '1'][len(args):])[:3]
+        return f'scrypt:{int(n)}:{int(r)}:{int(p)}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'Unsupported password hash method: {method}')
+
+
+def is_green_runtime():
+    """Whether eventlet has monkey-patched threading in this process"""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a bounded process pool (or tpool under eventlet)"""
+
+    def __init__(self, method, workers=2, max_pending=64, green=False, timeout=10):
+        self.method = normalize_method(method)
+        self.workers = workers
+        self.green = bool(workers) and green
+        self.timeout = timeout
+        self._executor = None
+        if self.green:
+            from eventlet import tpool
+            from eventlet.semaphore import BoundedSemaphore
+            self._slots = BoundedSemaphore(max_pending)
+            # tpool starts its threads on first use; nothing else in the app
+            # uses it, so this sizes it before then
+            tpool.set_num_threads(workers)
+        else:
+            self._slots = threading.BoundedSemaphore(max_pending)
+            if workers:
+                # spawn, not fork: the pool starts inside a running, threaded server
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+    def _run(self, fn, *args):
+        """
+        Run fn in the pool (or inline without one) and wait for the result
+
+        A slot is held until the hash is done, even if the caller stops
+        waiting, so max_pending also caps the hashing that is going on.
+        """
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Too many password checks waiting')
+
+        if self.green:
+            import eventlet
+            thread = eventlet.spawn(self._run_in_tpool, fn, *args)
+            with eventlet.Timeout(self.timeout, PasswordHasherBusy('Password check timed out')):
+                return thread.wait()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy('Password check timed out') from None
+
+    def _run_in_tpool(self, fn, *args):
+        """Hash in one of eventlet's real threads, then give the slot back"""
+        from eventlet import tpool
+        try:
+            return tpool.execute(fn, *args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether a stored hash was made with a different method or cost"""
+        return pwhash.split('$', 1)[0] != self.method
+
+
+def make_password_hasher(app, green=False):
+    """
+    Build a hasher from the app's config
+
+    Args:
+        app: Flask app
+        green: Use eventlet's tpool instead of a process pool
+
+    Returns:
+        PasswordHasher
+    """
+    return PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        green=green,
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+
+
+def get_password_hasher(app=None):
+    """
+    Get this process's hasher, starting its pool on first use
+
+    Created lazily so forked worker processes each start their own pool,
+    and so an eventlet worker has already monkey-patched by then.
+    """
+    app = app or current_app._get_current_object()
+    with _hasher_lock:
+        hasher = app.extensions.get('password_hasher')
+        if hasher is None or hasher[0] != os.getpid():
+            hasher = (os.getpid(), make_password_hasher(app, green=is_green_runtime()))
+            app.extensions['password_hasher'] = hasher
+        return hasher[1]
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured method
+
+    Returns:
+        str: Hash to store in User.password_hash
+
+    Raises:
+        PasswordHasherBusy: If the pool is backed up or the check times out
+    """
+    return get_password_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    """
+    Check a password against a stored hash
+
+    Returns:
+        bool: True if the password matches
+
+    Raises:
+        PasswordHasherBusy: If the pool is backed up or the check times out
+    """
+    return get_password_hasher().verify(pwhash, password)
+
+
+def password_needs_rehash(pwhash):
+    """Whether a stored hash should be redone with the current settings"""
+    return get_password_hasher().needs_rehash(pwhash)
@@ -0,0 +1,367 @@
+"""
+Read page counts and page sizes from PDF files
+
+Only the parts of the file that are needed are touched: the file is
+memory-mapped, the cross-reference table (or stream) at the end of the file
+gives the offset of each object, and from there only the catalog and page
+tree objects are read. Nothing else is decompressed or parsed.
+"""
+import mmap
+import re
+import zlib
+from collections import Counter
+
+# Named paper sizes in PDF points (1/72 inch), short side first
+PAPER_SIZES = {
+    'A3': (842, 1191),
+    'A4': (595, 842),
+    'A5': (420, 595),
+    'Letter': (612, 792),
+    'Legal': (612, 1008),
+}
+
+# How far two sizes can differ (in points) and still count as the same
+PAPER_SIZE_TOLERANCE = 5
+
+# Largest decoded stream we'll inflate; xref and object streams are far
+# smaller, so anything bigger is treated as a malformed (or hostile) file
+MAX_STREAM_SIZE = 16 * 1024 * 1024
+
+_REF = rb'(\d+)\s+\d+\s+R'
+_NUMBER = rb'(-?\d+(?:\.\d+)?|-?\.\d+)'
+_OBJECT_HEADER = re.compile(rb'(?<!\d)(\d+)\s+(\d+)\s+obj\b')
+_MEDIA_BOX = re.compile(rb'/MediaBox\s*\[\s*' + rb'\s+'.join([_NUMBER] * 4) + rb'\s*\]')
+
+
+class PdfStructureError(ValueError):
+    """Raised when a PDF's structure can't be followed"""
+
+
+def _dict_ref(data, key):
+    """Get an indirect reference (object number) stored under a key"""
+    match = re.search(rb'/' + key + rb'\s+' + _REF, data)
+    return int(match.group(1)) if match else None
+
+
+def _dict_int(data, key):
+    """Get an integer stored directly under a key"""
+    match = re.search(rb'/' + key + rb'\s+(\d+)\b(?!\s+\d+\s+R)', data)
+    return int(match.group(1)) if match else None
+
+
+def _dict_int_array(data, key):
+    """Get an array of integers stored under a key"""
+    match = re.search(rb'/' + key + rb'\s*\[([\d\s]*)\]', data)
+    return [int(n) for n in match.group(1).split()] if match else None
+
+
+def _png_unpredict(data, columns):
+    """Undo the PNG row predictors used by compressed xref streams"""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    output = bytearray()
+    for start in range(0, len(data), row_size):
+        filter_type = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        for i in range(len(row)):
+            left = row[i - 1] if i > 0 else 0
+            up = previous[i]
+            up_left = previous[i - 1] if i > 0 else 0
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif filter_type == 4:
+                estimate = left + up - up_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+                nearest = (left, up, up_left)[distances.index(min(distances))]
+                row[i] = (row[i] + nearest) & 0xFF
+        output += row
+        previous = row
+    return bytes(output)
+
+
+class _PdfFile:
+    """Random access to the objects of a memory-mapped PDF"""
+
+    def __init__(self, data, scan=False):
+        self.data = data
+        self.offsets = {}       # object number -> byte offset
+        self.compressed = {}    # object number -> (object stream number, index)
+        self._object_streams = {}
+        if scan:
+            self.trailer = self._scan()
+        else:
+            self.trailer = self._read_xref()
+
+    # Cross-reference ---------------------------------------------------
+
+    def _read_xref(self):
+        """Load object locations, newest revision first, and return the trailer"""
+        tail_start = max(0, len(self.data) - 2048)
+        position = self.data.rfind(b'startxref', tail_start)
+        if position < 0:
+            raise PdfStructureError('startxref not found')
+
+        match = re.match(rb'startxref\s+(\d+)', self.data[position:position + 40])
+        if not match:
+            raise PdfStructureError('Invalid startxref')
+
+        trailer = None
+        offset = int(match.group(1))
+        seen = set()
+        while offset is not None and offset not in seen:
+            seen.add(offset)
+            if self.data[offset:offset + 4] == b'xref':
+                section_trailer = self._read_xref_table(offset)
+            else:
+                section_trailer = self._read_xref_stream(offset)
+            trailer = trailer or section_trailer
+            offset = _dict_int(section_trailer, b'Prev')
+
+        return trailer
+
+    def _read_xref_table(self, offset):
+        """Read a classic 'xref' table and return its trailer dictionary"""
+        end = self.data.find(b'trailer', offset)
+        if end < 0:
+            raise PdfStructureError('trailer not found')
+
+        lines = iter(self.data[offset + 4:end].split())
+        for start in lines:
+            count = int(next(lines))
+            for number in range(int(start), int(start) + count):
+                entry_offset, _, kind = next(lines), next(lines), next(lines)
+                if kind == b'n':
+                    self.offsets.setdefault(number, int(entry_offset))
+
+        trailer_end = self.data.find(b'startxref', end)
+        return self.data[end:trailer_end if trailer_end > 0 else end + 4096]
+
+    def _read_xref_stream(self, offset):
+        """Read a PDF 1.5 cross-reference stream and return its dictionary"""
+        dictionary, stream = self._read_stream_at(offset)
+        widths = _dict_int_array(dictionary, b'W')
+        if not widths or len(widths) != 3:
+            raise PdfStructureError('Invalid xref stream')
+
+        index = _dict_int_array(dictionary, b'Index') or [0, _dict_int(dictionary, b'Size')]
+        position = 0
+        for pair in range(0, len(index), 2):
+            for number in range(index[pair], index[pair] + index[pair + 1]):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(stream[position:position + width], 'big'))
+                    position += width
+                kind = fields[0] if widths[0] else 1
+                if kind == 1:
+                    self.offsets.setdefault(number, fields[1])
+                elif kind == 2:
+                    self.compressed.setdefault(number, (fields[1], fields[2]))
+        return dictionary
+
+    def _read_stream_at(self, offset):
+        """Return (dictionary, decoded stream bytes) for the object at offset"""
+        start = self.data.find(b'stream', offset)
+        if start < 0:
+            raise PdfStructureError('stream not found')
+
+        dictionary = self.data[offset:start]
+        start += len(b'stream')
+        if self.data[start:start + 2] == b'\r\n':
+            start += 2
+        elif self.data[start:start + 1] in (b'\n', b'\r'):
+            start += 1
+
+        length = _dict_int(dictionary, b'Length')
+        if length is None:
+            length = self.data.find(b'endstream', start) - start
+        raw = self.data[start:start + length]
+
+        if b'/FlateDecode' in dictionary:
+            decompressor = zlib.decompressobj()
+            raw = decompressor.decompress(raw, MAX_STREAM_SIZE)
+            if decompressor.unconsumed_tail:
+                raise PdfStructureError('Stream too large')
+        elif b'/Filter' in dictionary:
+            raise PdfStructureError('Unsupported stream filter')
+
+        predictor = _dict_int(dictionary, b'Predictor')
+        if predictor and predictor >= 10:
+            raw = _png_unpredict(raw, _dict_int(dictionary, b'Columns') or 1)
+
+        return dictionary, raw
+
+    def _scan(self):
+        """Fallback for damaged cross-references: find objects by scanning"""
+        for match in _OBJECT_HEADER.finditer(self.data):
+            # Later definitions (incremental updates) replace earlier ones
+            self.offsets[int(match.group(1))] = match.start()
+
+        roots = list(re.finditer(rb'/Root\s+' + _REF, self.data))
+        if not roots:
+            raise PdfStructureError('Catalog not found')
+        return roots[-1].group(0)
+
+    # Objects -----------------------------------------------------------
+
+    def get(self, number):
+        """Get the bytes of an object's body (the dictionary, for streams)"""
+        if number in self.offsets:
+            offset = self.offsets[number]
+            end = self.data.find(b'endobj', offset)
+            body = self.data[offset:end if end > 0 else offset + 4096]
+            stream = body.find(b'stream')
+            return body[:stream] if stream > 0 else body
+
+        if number in self.compressed:
+            stream_number, index = self.compressed[number]
+            return self._get_compressed(stream_number, index)
+
+        raise PdfStructureError(f'Object {number} not found')
+
+    def _get_compressed(self, stream_number, index):
+        """Get an object stored inside an object stream"""
+        if stream_number not in self._object_streams:
+            dictionary, data = self._read_stream_at(self.offsets[stream_number])
+            count = _dict_int(dictionary, b'N')
+            first = _dict_int(dictionary, b'First')
+            header = [int(n) for n in data[:first].split()]
+            starts = [first + header[i] for i in range(1, 2 * count, 2)]
+            self._object_streams[stream_number] = (data, starts)
+
+        data, starts = self._object_streams[stream_number]
+        end = starts[index + 1] if index + 1 < len(starts) else len(data)
+        return data[starts[index]:end]
+
+    def pages_root(self):
+        """Get the object number of the root of the page tree"""
+        root = _dict_ref(self.trailer, b'Root')
+        if root is None:
+            raise PdfStructureError('Catalog not found')
+        pages = _dict_ref(self.get(root), b'Pages')
+        if pages is None:
+            raise PdfStructureError('Page tree not found')
+        return pages
+
+    def iter_page_sizes(self):
+        """Yield (width, height) in points for every page, in order"""
+        stack = [(self.pages_root(), None)]
+        visited = set()
+        while stack:
+            number, inherited_box = stack.pop()
+            if number in visited:
+                continue
+            visited.add(number)
+
+            body = self.get(number)
+            box = _MEDIA_BOX.search(body)
+            media_box = tuple(float(n) for n in box.groups()) if box else inherited_box
+
+            kids = re.search(rb'/Kids\s*\[([^\]]*)\]', body)
+            if kids:
+                # Push in reverse so pages come out in document order
+                refs = [int(n) for n in re.findall(_REF, kids.group(1))]
+                stack.extend((kid, media_box) for kid in reversed(refs))
+            elif media_box:
+                x0, y0, x1, y1 = media_box
+                yield abs(x1 - x0), abs(y1 - y0)
+            else:
+                yield None
+
+
+def _open(path):
+    """Memory-map a file for reading"""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _with_pdf(path, read):
+    """Run read(pdf), retrying with a scanned index if the xref is broken"""
+    data = _open(path)
+    try:
+        try:
+            return read(_PdfFile(data))
+        except (ValueError, KeyError, IndexError, StopIteration, zlib.error):
+            return read(_PdfFile(data, scan=True))
+    finally:
+        data.close()
+
+
+def count_pdf_pages(path):
+    """
+    Get the number of pages in a PDF
+
+    Reads /Count from the root of the page tree, so the cost doesn't depend
+    on the number of pages.
+
+    Args:
+        path: Absolute path to the PDF
+
+    Returns:
+        int: Page count, or None if the file can't be read as a PDF
+    """
+    def read(pdf):
+        count = _dict_int(pdf.get(pdf.pages_root()), b'Count')
+        if count is None:
+            raise PdfStructureError('Page count not found')
+        return count
+
+    try:
+        return _with_pdf(path, read)
+    except (OSError, ValueError, KeyError, IndexError, StopIteration, zlib.error):
+        return None
+
+
+def get_pdf_page_sizes(path):
+    """
+    Get the size of every page in a PDF
+
+    Args:
+        path: Absolute path to the PDF
+
+    Returns:
+        list: (width, height) in points per page (None where unknown),
+              or None if the file can't be read as a PDF
+    """
+    try:
+        return _with_pdf(path, lambda pdf: list(pdf.iter_page_sizes()))
+    except (OSError, ValueError, KeyError, IndexError, StopIteration, zlib.error):
+        return None
+
+
+def get_paper_size_name(width, height):
+    """
+    Name a page size, e.g. 'A4'
+
+    Args:
+        width: Page width in points
+        height: Page height in points
+
+    Returns:
+        str: Paper size name, or 'WxH pt' if it isn't a standard size
+    """
+    short_side, long_side = sorted((width, height))
+    for name, (paper_short, paper_long) in PAPER_SIZES.items():
+        if abs(short_side - paper_short) <= PAPER_SIZE_TOLERANCE and \
+           abs(long_side - paper_long) <= PAPER_SIZE_TOLERANCE:
+            return name
+    return f'{round(width)}x{round(height)} pt'
+
+
+def summarize_page_sizes(sizes):
+    """
+    Get the most common paper size in a list of page sizes
+
+    Args:
+        sizes: List from get_pdf_page_sizes
+
+    Returns:
+        str: Paper size name, or None if no sizes are known
+    """
+    names = Counter(get_paper_size_name(*size) for size in sizes or [] if size)
+    if not names:
+        return None
+    return names.most_common(1)[0][0]
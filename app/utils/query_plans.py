@@ -0,0 +1,43 @@
+"""
+Check that the hot request-list queries are served by an index
+
+Used by `flask explain-queries` and the test suite. SQLite only: the plan
+comes from EXPLAIN QUERY PLAN.
+"""
+from app import db
+
+
+def get_hot_queries(user_id=1):
+    """
+    Get the request-list queries the busiest pages run
+
+    Returns:
+        dict: Name mapped to a query
+    """
+    from app.models import PrintRequest
+
+    newest_first = (PrintRequest.submitted_at.desc(), PrintRequest.id.desc())
+    return {
+        'requests.dashboard': PrintRequest.query.filter_by(user_id=user_id).order_by(*newest_first),
+        'admin.admin_requests': PrintRequest.query.order_by(*newest_first),
+        'admin.admin_requests (status)': PrintRequest.query.filter_by(status='pending').order_by(*newest_first),
+        'admin.view_user': PrintRequest.query.filter_by(user_id=user_id).order_by(*newest_first),
+    }
+
+
+def explain(query):
+    """
+    Get SQLite's plan for a query
+
+    Returns:
+        list: The detail column of each plan row
+    """
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    plan = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    return [row[-1] for row in plan]
+
+
+def is_full_scan(details):
+    """Whether a plan reads the whole print_requests table"""
+    # A bare "SCAN print_requests" means a full table scan
+    return any(d.startswith('SCAN print_requests') and 'INDEX' not in d for d in details)
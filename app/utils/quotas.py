@@ -0,0 +1,236 @@
+"""
+Monthly page quotas per user and per department
+
+Every user and department has a running balance per month in the
+quota_balances table: pages reserved by pending and in-progress requests,
+and pages used by completed ones. The balance changes together with each
+request's status, so checking what's left is a single-row lookup rather
+than a sum over the request history. `flask reconcile-quotas` rebuilds
+the balances from history if they ever drift.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import extract, func, select
+
+from app import db
+from app.utils.upsert import upsert
+
+USER_SCOPE = 'user'
+DEPARTMENT_SCOPE = 'department'
+
+# Which running total a request's pages count against in each status
+STATUS_BUCKETS = {
+    'pending': 'reserved_pages',
+    'in_progress': 'reserved_pages',
+    'completed': 'used_pages',
+    'cancelled': None
+}
+
+
+def get_quota_period(dt=None):
+    """
+    Get the quota period a date falls in
+
+    Returns:
+        str: 'YYYY-MM'
+    """
+    return (dt or datetime.utcnow()).strftime('%Y-%m')
+
+
+def get_quota_limit(scope, subject):
+    """
+    Get the page limit for a user or department
+
+    Args:
+        scope: USER_SCOPE or DEPARTMENT_SCOPE
+        subject: User id or department name
+
+    Returns:
+        int: Pages per period, or 0 for no limit
+    """
+    from app.models import QuotaBudget
+
+    budget = db.session.get(QuotaBudget, (scope, str(subject)))
+    if budget is not None:
+        return budget.pages
+    if scope == USER_SCOPE:
+        return current_app.config['QUOTA_USER_PAGES']
+    return current_app.config['QUOTA_DEPARTMENT_PAGES']
+
+
+def get_quota_usage(scope, subject, period=None):
+    """
+    Get how many pages a user or department has used or reserved
+
+    Args:
+        scope: USER_SCOPE or DEPARTMENT_SCOPE
+        subject: User id or department name
+        period: 'YYYY-MM' (defaults to the current period)
+
+    Returns:
+        int: Reserved plus used pages
+    """
+    from app.models import QuotaBalance
+
+    balance = db.session.get(QuotaBalance, (scope, str(subject), period or get_quota_period()))
+    if balance is None:
+        return 0
+    return balance.reserved_pages + balance.used_pages
+
+
+def get_remaining_quota(scope, subject, period=None):
+    """
+    Get how many pages are left this period
+
+    Returns:
+        int: Pages left, or None if there is no limit
+    """
+    limit = get_quota_limit(scope, subject)
+    if not limit:
+        return None
+    return max(0, limit - get_quota_usage(scope, subject, period))
+
+
+def check_quota(user, pages):
+    """
+    Check whether a user may submit a request for a number of pages
+
+    This reads the balances before the request is saved, so it is a soft
+    limit: requests submitted at the same moment are each checked against
+    the balance without the others and can together go over the quota,
+    by at most one request per concurrent submission.
+
+    Args:
+        user: User submitting the request
+        pages: Total pages (pages x copies)
+
+    Returns:
+        tuple: (allowed: bool, message: str)
+    """
+    for scope, subject, name in (
+        (USER_SCOPE, user.id, 'your'),
+        (DEPARTMENT_SCOPE, user.faculty_department, f'the {user.faculty_department}')
+    ):
+        remaining = get_remaining_quota(scope, subject)
+        if remaining is not None and pages > remaining:
+            return False, (f'This request needs {pages} pages, but {name} print quota only has '
+                           f'{remaining} pages left this month.')
+    return True, 'OK'
+
+
+def _bump_balance(executor, scope, subject, period, bucket, delta):
+    """Add pages to one running total, creating the balance row if needed"""
+    from app.models import QuotaBalance
+
+    table = QuotaBalance.__table__
+    values = {'scope': scope, 'subject': str(subject), 'period': period,
+              'reserved_pages': 0, 'used_pages': 0}
+    values[bucket] = delta
+    upsert(executor, table, values, {bucket: table.c[bucket] + delta})
+
+
+def record_quota_change(executor, print_request, old_status, new_status, department=None):
+    """
+    Move a request's pages between the reserved and used totals
+
+    Runs inside the caller's transaction, like the status counters.
+
+    Args:
+        executor: Session or connection to run the statements on
+        print_request: The request whose status changes
+        old_status: Previous status (None for a new request)
+        new_status: New status (None for a deleted request)
+        department: The user's department, if already known
+    """
+    from app.models import User
+
+    old_bucket = STATUS_BUCKETS.get(old_status)
+    new_bucket = STATUS_BUCKETS.get(new_status)
+    if old_bucket == new_bucket:
+        return
+
+    if department is None:
+        department = executor.execute(
+            select(User.faculty_department).where(User.id == print_request.user_id)
+        ).scalar()
+
+    deltas = defaultdict(int)
+    _add_deltas(deltas, print_request.user_id, department, print_request.submitted_at,
+                print_request.get_total_pages(), old_bucket, new_bucket)
+    _apply_deltas(executor, deltas)
+
+
+def record_bulk_quota_change(executor, changes, new_status):
+    """
+    Move many requests' pages at once, with one statement per balance row
+
+    Args:
+        executor: Session or connection to run the statements on
+        changes: (user_id, department, submitted_at, total_pages, old_status) tuples
+        new_status: Status every request moves to
+    """
+    new_bucket = STATUS_BUCKETS.get(new_status)
+    deltas = defaultdict(int)
+    for user_id, department, submitted_at, pages, old_status in changes:
+        old_bucket = STATUS_BUCKETS.get(old_status)
+        if old_bucket != new_bucket:
+            _add_deltas(deltas, user_id, department, submitted_at, pages, old_bucket, new_bucket)
+    _apply_deltas(executor, deltas)
+
+
+def _add_deltas(deltas, user_id, department, submitted_at, pages, old_bucket, new_bucket):
+    """Collect the balance changes for one request in deltas"""
+    period = get_quota_period(submitted_at)
+    for scope, subject in ((USER_SCOPE, user_id), (DEPARTMENT_SCOPE, department)):
+        if old_bucket:
+            deltas[(scope, str(subject), period, old_bucket)] -= pages
+        if new_bucket:
+            deltas[(scope, str(subject), period, new_bucket)] += pages
+
+
+def _apply_deltas(executor, deltas):
+    """Write collected balance changes"""
+    for (scope, subject, period, bucket), delta in deltas.items():
+        if delta:
+            _bump_balance(executor, scope, subject, period, bucket, delta)
+
+
+def reconcile_quotas():
+    """
+    Rebuild every quota balance from the request history
+
+    Returns:
+        int: Number of balance rows written
+    """
+    from app.models import PrintRequest, QuotaBalance, User
+
+    year = extract('year', PrintRequest.submitted_at)
+    month = extract('month', PrintRequest.submitted_at)
+    query = db.session.query(
+        PrintRequest.user_id,
+        User.faculty_department,
+        year,
+        month,
+        PrintRequest.status,
+        func.sum(PrintRequest.number_of_pages * PrintRequest.number_of_copies)
+    ).join(User, PrintRequest.user_id == User.id)\
+        .group_by(PrintRequest.user_id, User.faculty_department, year, month, PrintRequest.status)
+
+    balances = defaultdict(lambda: {'reserved_pages': 0, 'used_pages': 0})
+    for user_id, department, year_value, month_value, status, pages in query:
+        bucket = STATUS_BUCKETS.get(status)
+        if not bucket:
+            continue
+        period = f'{int(year_value):04d}-{int(month_value):02d}'
+        balances[(USER_SCOPE, str(user_id), period)][bucket] += pages
+        balances[(DEPARTMENT_SCOPE, department, period)][bucket] += pages
+
+    QuotaBalance.query.delete()
+    db.session.bulk_insert_mappings(QuotaBalance, [
+        dict(scope=scope, subject=subject, period=period, **totals)
+        for (scope, subject, period), totals in balances.items()
+    ])
+    db.session.commit()
+    return len(balances)
@@ -0,0 +1,196 @@
+"""
+Sliding-window rate limits for failed logins
+
+Each key (an email address or a client IP) keeps only three numbers: the
+current fixed window, the count in it and the count in the window before.
+The count over the last `window` seconds is estimated by weighting the
+previous window by how much of it still overlaps, which smooths out the
+burst a plain fixed window allows at its boundary without storing a
+timestamp per attempt.
+
+Checks happen before the user lookup and password hash, so a script
+guessing passwords is turned away without costing a database query or a
+hash. The flip side is that the per-email limit can't tell the owner
+from the guesser: once an address is over it, the right password is
+refused too until the failures age out of the window.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+def _estimate(entry, now, window):
+    """Estimated attempts in the last window from (window_index, current, previous)"""
+    index = int(now // window)
+    elapsed = (now % window) / window
+    entry_index, current, previous = entry
+    if entry_index == index:
+        return previous * (1 - elapsed) + current
+    if entry_index == index - 1:
+        return current * (1 - elapsed)
+    return 0.0
+
+
+def _advance(entry, now, window):
+    """Count one more attempt, rolling the windows forward if needed"""
+    index = int(now // window)
+    if entry is None:
+        return [index, 1, 0]
+    entry_index, current, previous = entry
+    if entry_index == index:
+        return [index, current + 1, previous]
+    if entry_index == index - 1:
+        return [index, 1, current]
+    return [index, 1, 0]
+
+
+class MemoryRateLimiter:
+    """Process-local sliding-window counters, least recently used evicted first"""
+
+    def __init__(self, window=900, maxsize=50000):
+        self.window = window
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        """Estimated attempts for key in the last window"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return _estimate(entry, time.time(), self.window) if entry else 0.0
+
+    def hit(self, key):
+        """Record an attempt for key"""
+        with self._lock:
+            self._entries[key] = _advance(self._entries.get(key), time.time(), self.window)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def reset(self, key):
+        """Forget the attempts for key"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteRateLimiter:
+    """Sliding-window counters shared between worker processes through a SQLite file"""
+
+    def __init__(self, path, window=900):
+        self.path = path
+        self.window = window
+        self._local = threading.local()
+        self._purged_index = None
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits '
+            '(key TEXT PRIMARY KEY, window_index INTEGER NOT NULL, '
+            'current INTEGER NOT NULL, previous INTEGER NOT NULL)'
+        )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def count(self, key):
+        """Estimated attempts for key in the last window"""
+        row = self._connect().execute(
+            'SELECT window_index, current, previous FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        return _estimate(row, time.time(), self.window) if row else 0.0
+
+    def hit(self, key):
+        """Record an attempt for key"""
+        now = time.time()
+        conn = self._connect()
+        # Take the write lock up front so two workers can't both read the old count
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_index, current, previous FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            entry = _advance(row, now, self.window)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, window_index, current, previous) '
+                'VALUES (?, ?, ?, ?)',
+                (key, *entry)
+            )
+            # Once per window, drop keys that no longer count towards anything
+            if self._purged_index != entry[0]:
+                conn.execute('DELETE FROM rate_limits WHERE window_index < ?', (entry[0] - 1,))
+                self._purged_index = entry[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def reset(self, key):
+        """Forget the attempts for key"""
+        self._connect().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+
+def init_rate_limiter(app):
+    """
+    Create the app's rate limiter from config and register it on the app
+
+    Args:
+        app: Flask application
+    """
+    window = app.config.get('LOGIN_RATE_WINDOW', 900)
+
+    if app.config.get('RATE_LIMIT_BACKEND') == 'sqlite':
+        path = app.config['CACHE_SQLITE_PATH']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        limiter = SQLiteRateLimiter(path, window=window)
+    else:
+        limiter = MemoryRateLimiter(window=window)
+
+    app.extensions['rate_limiter'] = limiter
+    return limiter
+
+
+def get_rate_limiter():
+    """Get the current app's rate limiter"""
+    return current_app.extensions['rate_limiter']
+
+
+def _login_keys(email, ip):
+    """Limiter keys for an email address and a client IP"""
+    return f'login:email:{(email or "").strip().lower()}', f'login:ip:{ip}'
+
+
+def login_blocked(email, ip):
+    """
+    Check whether a login attempt should be refused without checking the password
+
+    Args:
+        email: Email address being logged in to
+        ip: Client IP address
+
+    Returns:
+        bool: True if the email or the IP has too many recent failures
+    """
+    limiter = get_rate_limiter()
+    email_key, ip_key = _login_keys(email, ip)
+    return (limiter.count(email_key) >= current_app.config['LOGIN_FAILURES_PER_EMAIL'] or
+            limiter.count(ip_key) >= current_app.config['LOGIN_FAILURES_PER_IP'])
+
+
+def record_login_failure(email, ip):
+    """Count a failed login against the email address and the client IP"""
+    limiter = get_rate_limiter()
+    for key in _login_keys(email, ip):
+        limiter.hit(key)
+
+
+def clear_login_failures(email):
+    """Forget an email address's failed logins after a successful one"""
+    get_rate_limiter().reset(_login_keys(email, None)[0])
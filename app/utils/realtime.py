@@ -0,0 +1,124 @@
+"""
+Push request updates to open pages over Socket.IO
+
+Every logged-in browser joins a room for its user (user_<id>), and admins
+also join the admins room. Routes call the emit_* helpers after committing
+a change and static/js/realtime.js patches the page in place, so nobody
+has to reload to see a status change.
+"""
+from flask import current_app
+from flask_login import current_user
+from flask_socketio import join_room
+
+from app import socketio
+from app.utils.template_helpers import get_status_badge_class, get_status_display
+
+ADMIN_ROOM = 'admins'
+
+
+def user_room(user_id):
+    """Get the room name for one user's browsers"""
+    return f'user_{user_id}'
+
+
+def init_realtime(app):
+    """
+    Set up Socket.IO on the app
+
+    Args:
+        app: Flask application
+    """
+    socketio.init_app(
+        app,
+        async_mode=app.config.get('SOCKETIO_ASYNC_MODE'),
+        message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    )
+    socketio.on_event('connect', on_connect)
+
+
+def on_connect(auth=None):
+    """Put the connecting browser in its rooms, or refuse anonymous users"""
+    if not current_user.is_authenticated:
+        return False
+
+    join_room(user_room(current_user.id))
+    if current_user.is_admin:
+        join_room(ADMIN_ROOM)
+
+
+def _request_payload(print_request, old_status):
+    """Fields the pages need to redraw one request"""
+    return {
+        'id': print_request.id,
+        'request_number': print_request.request_number,
+        'status': print_request.status,
+        'old_status': old_status,
+        'status_display': get_status_display(print_request.status),
+        'badge_class': get_status_badge_class(print_request.status)
+    }
+
+
+def _emit(event, payload, room):
+    """Emit an event, logging instead of failing the request if it can't be sent"""
+    try:
+        socketio.emit(event, payload, to=room)
+    except Exception as e:
+        current_app.logger.error(f'Realtime {event} to {room} failed: {str(e)}')
+
+
+def emit_request_update(print_request, old_status):
+    """
+    Tell the owner and the admins that a request's status changed
+
+    Call after the change is committed.
+
+    Args:
+        print_request: PrintRequest with its new status
+        old_status: Status before the change
+    """
+    from app.utils.stats import get_request_stats
+
+    payload = _request_payload(print_request, old_status)
+    _emit('request_updated', payload, user_room(print_request.user_id))
+    _emit('queue_updated', dict(payload, counts=get_request_stats()), ADMIN_ROOM)
+
+
+def emit_new_request(print_request):
+    """
+    Tell the admins a request was submitted
+
+    Call after the request is committed.
+
+    Args:
+        print_request: The new PrintRequest
+    """
+    from app.utils.stats import get_request_stats
+
+    payload = _request_payload(print_request, None)
+    payload['counts'] = get_request_stats()
+    payload['user_name'] = print_request.user.name
+    _emit('queue_updated', payload, ADMIN_ROOM)
+
+
+def emit_bulk_update(changed, new_status):
+    """
+    Tell owners and admins about a bulk status change
+
+    Args:
+        changed: List from bulk_update_status
+        new_status: Status the requests moved to
+    """
+    from app.utils.stats import get_request_stats
+
+    counts = get_request_stats()
+    for change in changed:
+        payload = {
+            'id': change['id'],
+            'request_number': change['request_number'],
+            'status': new_status,
+            'old_status': change['old_status'],
+            'status_display': get_status_display(new_status),
+            'badge_class': get_status_badge_class(new_status)
+        }
+        _emit('request_updated', payload, user_room(change['user_id']))
+        _emit('queue_updated', dict(payload, counts=counts), ADMIN_ROOM)
@@ -0,0 +1,197 @@
+"""
+Print-room schedule for the pending queue
+
+Pending requests are grouped into batches that can run without touching
+the printer: same paper size, print format, duplex setting and finishing.
+Each request is due PRINT_SLA_HOURS after it was submitted. Batches are
+ordered by their earliest due time, so nothing waits behind a large,
+less urgent batch. Inside a batch, users take turns, so one teacher's
+pile of jobs can't push everyone else's into the next batch, except that
+jobs already past due go first: taking turns never holds back a job that
+is late.
+"""
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.utils.page_range_parser import count_pages_in_range
+
+
+def get_finishing(print_request):
+    """
+    Describe the finishing a request needs
+
+    Returns:
+        str: 'none', 'stapled', 'laminated' or 'stapled+laminated'
+    """
+    steps = []
+    if print_request.is_stapled:
+        steps.append('stapled')
+    if print_request.is_laminated:
+        steps.append('laminated')
+    return '+'.join(steps) or 'none'
+
+
+def count_sheets(print_request):
+    """
+    Count the sheets of paper a request uses
+
+    Only pages in the page range are printed, and double-sided printing
+    puts two pages on each sheet.
+    """
+    pages = print_request.number_of_pages
+    if print_request.page_range:
+        try:
+            pages = count_pages_in_range(print_request.page_range) or pages
+        except ValueError:
+            pass
+    if print_request.is_double_sided:
+        pages = math.ceil(pages / 2)
+    return pages * print_request.number_of_copies
+
+
+class PrintBatch:
+    """Requests that can be printed back to back with one printer setup"""
+
+    def __init__(self, paper_size, print_format, is_double_sided, finishing):
+        self.paper_size = paper_size
+        self.print_format = print_format
+        self.is_double_sided = is_double_sided
+        self.finishing = finishing
+        self.jobs = []  # (print_request, sheets, due_at)
+        self.sheets = 0
+        self.due_at = None  # when the most urgent request in the batch is due
+
+    def add(self, print_request, sheets, due_at):
+        """Add a request to the end of the batch"""
+        self.jobs.append((print_request, sheets, due_at))
+        self.sheets += sheets
+        if self.due_at is None or due_at < self.due_at:
+            self.due_at = due_at
+
+    def is_overdue(self, now=None):
+        """Check if any request in the batch is past its due time"""
+        return self.due_at < (now or datetime.utcnow())
+
+    def get_label(self):
+        """Describe the printer setup, e.g. 'A4 · Color · Double-sided · Stapled'"""
+        parts = [
+            self.paper_size,
+            'Color' if self.print_format == 'color' else 'B&W',
+            'Double-sided' if self.is_double_sided else 'Single-sided'
+        ]
+        if self.finishing != 'none':
+            parts.append(self.finishing.replace('+', ' & ').title())
+        return ' · '.join(parts)
+
+    def to_dict(self, now=None):
+        """Convert to a JSON-serializable dict"""
+        return {
+            'paper_size': self.paper_size,
+            'print_format': self.print_format,
+            'is_double_sided': self.is_double_sided,
+            'finishing': self.finishing,
+            'sheets': self.sheets,
+            'due_at': self.due_at.isoformat(),
+            'overdue': self.is_overdue(now),
+            'requests': [
+                {
+                    'id': print_request.id,
+                    'request_number': print_request.request_number,
+                    'user_id': print_request.user_id,
+                    'sheets': sheets,
+                    'submitted_at': print_request.submitted_at.isoformat(),
+                    'due_at': due_at.isoformat()
+                }
+                for print_request, sheets, due_at in self.jobs
+            ]
+        }
+
+
+def _take_turns(jobs, now):
+    """
+    Interleave jobs so users take turns
+
+    Jobs already past due go first, in due order, whoever they belong to.
+    The rest are interleaved: each user's jobs stay in due order; users go
+    in the order their most urgent job is due.
+
+    Args:
+        jobs: (print_request, sheets, due_at) tuples sorted by due_at
+        now: Current time; jobs due before it are overdue
+
+    Returns:
+        list: The same tuples, overdue ones first, then one job per user per round
+    """
+    ordered = [job for job in jobs if job[2] < now]
+    by_user = OrderedDict()
+    for job in jobs[len(ordered):]:
+        by_user.setdefault(job[0].user_id, []).append(job)
+
+    queues = list(by_user.values())
+    for round_number in range(max((len(queue) for queue in queues), default=0)):
+        ordered.extend(queue[round_number] for queue in queues if round_number < len(queue))
+    return ordered
+
+
+def build_schedule(print_requests, sla_hours=None, max_sheets=None, now=None):
+    """
+    Split requests into printer-setup batches in the order to run them
+
+    Args:
+        print_requests: Pending PrintRequest objects
+        sla_hours: Hours after submission a request is due (defaults to PRINT_SLA_HOURS)
+        max_sheets: Largest batch in sheets (defaults to PRINT_BATCH_MAX_SHEETS);
+                    a single bigger request still gets a batch of its own
+        now: Current time (defaults to now)
+
+    Returns:
+        list: PrintBatch objects, most urgent first
+    """
+    sla = timedelta(hours=sla_hours or current_app.config['PRINT_SLA_HOURS'])
+    max_sheets = max_sheets or current_app.config['PRINT_BATCH_MAX_SHEETS']
+    now = now or datetime.utcnow()
+
+    groups = {}
+    for print_request in print_requests:
+        key = (
+            print_request.paper_size,
+            print_request.print_format,
+            print_request.is_double_sided,
+            get_finishing(print_request)
+        )
+        groups.setdefault(key, []).append(
+            (print_request, count_sheets(print_request), print_request.submitted_at + sla)
+        )
+
+    batches = []
+    for key, jobs in groups.items():
+        jobs.sort(key=lambda job: (job[2], job[0].id))
+        batch = None
+        for job in _take_turns(jobs, now):
+            if batch is None or (batch.jobs and batch.sheets + job[1] > max_sheets):
+                batch = PrintBatch(*key)
+                batches.append(batch)
+            batch.add(*job)
+
+    # Earliest due first; among equally urgent batches, do the small ones first
+    batches.sort(key=lambda batch: (batch.due_at, batch.sheets))
+    return batches
+
+
+def get_print_schedule():
+    """
+    Build the schedule for everything currently pending
+
+    Returns:
+        list: PrintBatch objects, most urgent first
+    """
+    from sqlalchemy.orm import joinedload
+    from app.models import PrintRequest
+
+    pending = PrintRequest.query.options(joinedload(PrintRequest.user))\
+        .filter_by(status='pending')\
+        .order_by(PrintRequest.submitted_at, PrintRequest.id).all()
+    return build_schedule(pending)
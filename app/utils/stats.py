@@ -0,0 +1,119 @@
+"""
+Request statistics backed by a small materialized counters table
+"""
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+# Every status a print request can be in
+REQUEST_STATUSES = ['pending', 'in_progress', 'completed', 'cancelled']
+
+
+def count_by_status(user_id=None):
+    """
+    Count print requests per status with a single grouped query
+
+    Args:
+        user_id: Only count requests for this user (optional)
+
+    Returns:
+        dict: Status mapped to count, with every status present
+    """
+    from app.models import PrintRequest
+
+    query = db.session.query(PrintRequest.status, func.count(PrintRequest.id))
+    if user_id is not None:
+        query = query.filter(PrintRequest.user_id == user_id)
+
+    counts = dict.fromkeys(REQUEST_STATUSES, 0)
+    for status, count in query.group_by(PrintRequest.status):
+        counts[status] = count
+    return counts
+
+
+def rebuild_status_counts():
+    """
+    Rebuild the counters table from the print_requests table
+
+    Returns:
+        dict: Status mapped to count
+    """
+    from app.models import RequestStatusCount
+
+    counts = count_by_status()
+    RequestStatusCount.query.delete()
+    db.session.add_all(
+        RequestStatusCount(status=status, count=count)
+        for status, count in counts.items()
+    )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker rebuilt the table at the same time
+        db.session.rollback()
+    return counts
+
+
+def bump_status_count(executor, status, delta):
+    """
+    Adjust the stored counter for a status
+
+    Runs inside the caller's transaction so the counter commits (or rolls
+    back) together with the request row. Does nothing until the counters
+    table has been built; the first read builds it from history.
+
+    Args:
+        executor: Session or connection to run the UPDATE on
+        status: Status whose counter should change
+        delta: Amount to add (negative to subtract)
+    """
+    from app.models import RequestStatusCount
+
+    table = RequestStatusCount.__table__
+    executor.execute(
+        table.update()
+        .where(table.c.status == status)
+        .values(count=table.c.count + delta)
+    )
+
+
+def record_status_change(executor, old_status, new_status):
+    """
+    Move one request from one status counter to another
+
+    Args:
+        executor: Session or connection to run the UPDATEs on
+        old_status: Previous status (None for a new request)
+        new_status: New status (None for a deleted request)
+    """
+    if old_status == new_status:
+        return
+    if old_status:
+        bump_status_count(executor, old_status, -1)
+    if new_status:
+        bump_status_count(executor, new_status, 1)
+
+
+def get_request_stats():
+    """
+    Get overall request counts for the admin dashboard
+
+    Reads the counters table (one small indexed read), building it from
+    history the first time it is needed.
+
+    Returns:
+        dict: Counts per status plus a 'total' key
+    """
+    from app.models import RequestStatusCount
+
+    counts = dict.fromkeys(REQUEST_STATUSES, 0)
+    rows = RequestStatusCount.query.all()
+    if rows:
+        for row in rows:
+            counts[row.status] = row.count
+    else:
+        counts.update(rebuild_status_counts())
+
+    counts['total'] = sum(counts[status] for status in REQUEST_STATUSES)
+    return counts
@@ -1,23 +1,27 @@
 """
 Template helper functions
 """
-from flask import url_for
+from flask import url_for, current_app
 import os
 
+PENDING_COUNT_CACHE_KEY = 'pending_count'
 
-def get_profile_picture_url(user):
+
+def get_profile_picture_url(user, size='medium'):
     """
     Get URL for user's profile picture
     
     Args:
         user: User object
+        size: 'small', 'medium' or 'large' (see AVATAR_SIZES)
     
     Returns:
         str: URL to profile picture or default avatar
     """
     if user.profile_picture:
-        # Return URL to uploaded profile picture
-        return url_for('static', filename=f'uploads/{user.profile_picture}')
+        # Served at the requested size by the profile blueprint
+        name = os.path.splitext(os.path.basename(user.profile_picture))[0]
+        return url_for('profile.picture', name=name, size=size)
     else:
         # Return default avatar
         return url_for('static', filename='images/default-avatar.png')
@@ -136,8 +140,24 @@ def get_pending_count():
     """
     Get count of pending print requests
     
+    Cached because the navbar shows it on every page. Routes that change
+    a request's status call invalidate_pending_count().
+    
     Returns:
         int: Number of pending requests
     """
-    from app.models import PrintRequest
-    return PrintRequest.query.filter_by(status='pending').count()
+    from app.utils.cache import get_cache
+    from app.utils.stats import get_request_stats
+    
+    cache = get_cache()
+    count = cache.get(PENDING_COUNT_CACHE_KEY)
+    if count is None:
+        count = get_request_stats()['pending']
+        cache.set(PENDING_COUNT_CACHE_KEY, count, ttl=current_app.config['PENDING_COUNT_CACHE_TTL'])
+    return count
+
+
+def invalidate_pending_count():
+    """Drop the cached pending count after a status change"""
+    from app.utils.cache import get_cache
+    get_cache().delete(PENDING_COUNT_CACHE_KEY)
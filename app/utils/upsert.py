@@ -0,0 +1,63 @@
+"""
+Insert-or-update of a single row keyed by its primary key
+
+Counters that many requests bump at once (blob references, quota
+balances) can't be written as an UPDATE followed by an INSERT when no row
+matched: two first writers both miss and one of them then fails on the
+primary key. SQLite and PostgreSQL do it in one statement with
+INSERT ... ON CONFLICT DO UPDATE; other databases insert inside a
+savepoint and fall back to the update if the row turned up meanwhile.
+"""
+from sqlalchemy import and_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+# INSERT ... ON CONFLICT DO UPDATE for the databases that have it
+UPSERT_INSERTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': postgresql_insert
+}
+
+
+def _dialect(executor):
+    """Get the dialect of a Session or Connection"""
+    if hasattr(executor, 'get_bind'):
+        return executor.get_bind().dialect
+    return executor.dialect
+
+
+def upsert(executor, table, values, set_, returning=None):
+    """
+    Insert a row, or update it if its primary key already exists
+
+    Args:
+        executor: Session or connection to run the statements on
+        table: Table to write to
+        values: Column values of the new row, including the primary key
+        set_: Column values (usually expressions) to apply to an existing row
+        returning: Column to read back from the written row, if any
+
+    Returns:
+        The value of the returning column, or None
+    """
+    insert = UPSERT_INSERTS.get(_dialect(executor).name)
+    if insert is not None:
+        statement = insert(table).values(values).on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_=set_
+        )
+        if returning is None:
+            executor.execute(statement)
+            return None
+        return executor.execute(statement.returning(returning)).scalar_one()
+
+    key = and_(*(column == values[column.name] for column in table.primary_key.columns))
+    try:
+        with executor.begin_nested():
+            executor.execute(table.insert().values(values))
+    except IntegrityError:
+        executor.execute(table.update().where(key).values(set_))
+    if returning is None:
+        return None
+    return executor.execute(select(returning).where(key)).scalar_one()
@@ -0,0 +1,87 @@
+"""
+Cached logged-in user for Flask-Login
+
+Flask-Login loads the user on every request from a logged-in browser,
+before the view runs. Most pages only need who the user is (name, email,
+department, admin flag, avatar), so those fields are kept in a
+per-worker cache and current_user is a CachedUser built from them. The
+real User row is loaded only when a view needs something else, such as
+their requests or password hash, or changes the user.
+
+Views that change cached fields call invalidate_user after committing.
+Other workers pick the change up within USER_CACHE_TTL seconds.
+"""
+from flask import current_app
+from flask_login import UserMixin
+
+from app import db
+
+# User columns kept in the cache
+IDENTITY_FIELDS = ('id', 'card_id', 'name', 'email', 'faculty_department', 'is_admin', 'profile_picture', 'created_at')
+
+
+class CachedUser(UserMixin):
+    """Stand-in for User built from cached fields, loading the row on demand"""
+
+    def __init__(self, identity):
+        self._identity = identity
+        self._user = None
+
+    def _get_user(self):
+        """Load the User row (once per request)"""
+        from app.models import User
+
+        if self._user is None:
+            self._user = db.session.get(User, self._identity['id'])
+        return self._user
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the proxy itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._user is None and name in self._identity:
+            return self._identity[name]
+        return getattr(self._get_user(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            # Changes go to the real row so the session commits them
+            setattr(self._get_user(), name, value)
+
+    def __repr__(self):
+        return f'<CachedUser {self._identity["email"]}>'
+
+
+def get_user_cache():
+    """Get the current app's user cache"""
+    return current_app.extensions['user_cache']
+
+
+def load_cached_user(user_id):
+    """
+    Get the logged-in user, from the cache when possible
+
+    Args:
+        user_id: User ID from the session
+
+    Returns:
+        CachedUser, or None if there is no such user
+    """
+    from app.models import User
+
+    cache = get_user_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = {field: getattr(user, field) for field in IDENTITY_FIELDS}
+        cache.set(user_id, identity)
+    return CachedUser(identity)
+
+
+def invalidate_user(user_id):
+    """Drop a user's cached fields so the next request reloads them"""
+    get_user_cache().delete(user_id)
@@ -0,0 +1,207 @@
+"""
+Print request status transitions and their history
+
+TRANSITIONS lists which status a request may move to from each status.
+Every change, including the initial submission, is appended to the
+request_events table, so a request's history and the turnaround times
+(waiting in the queue, being printed, start to finish) are read straight
+from the log instead of being inferred from updated_at.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import aliased
+
+from app import db
+
+# Status -> statuses it may move to
+TRANSITIONS = {
+    'pending': ('in_progress', 'completed', 'cancelled'),
+    'in_progress': ('pending', 'completed', 'cancelled'),
+    'completed': (),
+    'cancelled': ('pending',)  # reopened by an admin
+}
+
+
+def get_allowed_transitions(status):
+    """
+    Get the statuses a request may move to next
+
+    Args:
+        status: Current status
+
+    Returns:
+        tuple: Allowed next statuses
+    """
+    return TRANSITIONS.get(status, ())
+
+
+def check_transition(old_status, new_status):
+    """
+    Check whether a request may move from one status to another
+
+    Args:
+        old_status: Current status
+        new_status: Requested status
+
+    Returns:
+        tuple: (allowed: bool, message: str)
+    """
+    from app.utils.template_helpers import get_status_display
+
+    if new_status not in TRANSITIONS:
+        return False, 'Invalid status selected.'
+    if new_status not in get_allowed_transitions(old_status):
+        return False, (f'A {get_status_display(old_status).lower()} request cannot be '
+                       f'moved to {get_status_display(new_status).lower()}.')
+    return True, 'OK'
+
+
+def record_event(executor, request_id, old_status, new_status, actor_id=None, note=None, created_at=None):
+    """
+    Append one status change to the request's history
+
+    Runs inside the caller's transaction, like the status counters.
+
+    Args:
+        executor: Session or connection to run the statement on
+        request_id: ID of the request that changed
+        old_status: Previous status (None when the request is submitted)
+        new_status: New status
+        actor_id: ID of the user who made the change (optional)
+        note: Note from the admin (optional)
+        created_at: When it happened (defaults to now)
+    """
+    record_events(executor, [request_id], old_status, new_status, actor_id, note, created_at)
+
+
+def record_events(executor, request_ids, old_status, new_status, actor_id=None, note=None, created_at=None):
+    """
+    Append the same status change for many requests with one statement
+
+    old_status may be a single status or a dict of request ID -> status.
+
+    Args:
+        executor: Session or connection to run the statement on
+        request_ids: IDs of the requests that changed
+        old_status: Previous status, or dict of previous status per request
+        new_status: New status
+        actor_id: ID of the user who made the change (optional)
+        note: Note from the admin (optional)
+        created_at: When it happened (defaults to now)
+    """
+    from app.models import RequestEvent
+
+    if not request_ids:
+        return
+
+    created_at = created_at or datetime.utcnow()
+    executor.execute(RequestEvent.__table__.insert(), [
+        {
+            'request_id': request_id,
+            'from_status': old_status.get(request_id) if isinstance(old_status, dict) else old_status,
+            'to_status': new_status,
+            'actor_id': actor_id,
+            'note': note or None,
+            'created_at': created_at
+        }
+        for request_id in request_ids
+    ])
+
+
+def get_request_history(request_id):
+    """
+    Get a request's status changes, oldest first
+
+    Args:
+        request_id: ID of the request
+
+    Returns:
+        list: RequestEvent objects with their actors loaded
+    """
+    from sqlalchemy.orm import joinedload
+    from app.models import RequestEvent
+
+    return RequestEvent.query.options(joinedload(RequestEvent.actor))\
+        .filter(RequestEvent.request_id == request_id)\
+        .order_by(RequestEvent.created_at, RequestEvent.id).all()
+
+
+def _hours(start, end):
+    """Hours between two datetimes, or None if either is missing"""
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds() / 3600
+
+
+def _summarize(values):
+    """Average and median of the values that are present"""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return {'avg_hours': None, 'median_hours': None}
+    middle = len(values) // 2
+    median = values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+    return {
+        'avg_hours': round(sum(values) / len(values), 2),
+        'median_hours': round(median, 2)
+    }
+
+
+def get_turnaround_metrics(start=None, end=None):
+    """
+    Turnaround times for requests completed in a date range
+
+    Times are measured over the cycle that ended in completion: from the
+    submission, or the last time an admin reopened the request after it
+    was cancelled, to the first move to in progress after that, and on to
+    completion. The completions in the range are found with one scan of
+    the (to_status, created_at) index, and each request's cycle with
+    grouped passes over the (request_id, created_at) index, so only one
+    row per completed request comes back.
+
+    Args:
+        start: Only include requests completed on/after this datetime (optional)
+        end: Only include requests completed before this datetime (optional)
+
+    Returns:
+        dict: completed count plus avg/median hours for queue (submitted to
+              in progress), printing (in progress to completed) and total
+    """
+    from app.models import RequestEvent
+
+    completed = db.session.query(RequestEvent.request_id)\
+        .filter(RequestEvent.to_status == 'completed')
+    if start is not None:
+        completed = completed.filter(RequestEvent.created_at >= start)
+    if end is not None:
+        completed = completed.filter(RequestEvent.created_at < end)
+
+    # Completed is final, so the last submission or reopen starts the cycle
+    is_submission = or_(
+        RequestEvent.from_status.is_(None),
+        and_(RequestEvent.from_status == 'cancelled', RequestEvent.to_status == 'pending')
+    )
+    cycles = db.session.query(
+        RequestEvent.request_id.label('request_id'),
+        func.max(case((is_submission, RequestEvent.created_at))).label('submitted_at'),
+        func.max(case((RequestEvent.to_status == 'completed', RequestEvent.created_at))).label('completed_at')
+    ).filter(RequestEvent.request_id.in_(completed.scalar_subquery()))\
+        .group_by(RequestEvent.request_id).subquery()
+
+    started = aliased(RequestEvent)
+    rows = db.session.query(
+        cycles.c.submitted_at,
+        func.min(started.created_at),
+        cycles.c.completed_at
+    ).outerjoin(started, and_(
+        started.request_id == cycles.c.request_id,
+        started.to_status == 'in_progress',
+        started.created_at >= cycles.c.submitted_at
+    )).group_by(cycles.c.request_id, cycles.c.submitted_at, cycles.c.completed_at).all()
+
+    return {
+        'completed': len(rows),
+        'queue': _summarize(_hours(submitted, started) for submitted, started, _ in rows),
+        'printing': _summarize(_hours(started, finished) for _, started, finished in rows),
+        'total': _summarize(_hours(submitted, finished) for submitted, _, finished in rows)
+    }
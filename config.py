@@ -15,6 +15,48 @@ class Config:
     ALLOWED_DOCUMENT_EXTENSIONS = {'pdf', 'doc', 'docx'}
     ALLOWED_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
     
+    # Request lists are paginated - 25 cards per page keeps pages light
+    REQUESTS_PER_PAGE = int(os.environ.get('REQUESTS_PER_PAGE') or 25)
+    
+    # Caching - 'memory' is per worker, 'sqlite' is shared by all workers
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or os.path.join(basedir, 'cache.sqlite')
+    CACHE_DEFAULT_TTL = 60
+    PENDING_COUNT_CACHE_TTL = 30  # navbar badge can lag a little behind
+    USER_CACHE_SIZE = 1024  # logged-in users kept per worker
+    USER_CACHE_TTL = 60  # other workers see profile changes after this long
+    
+    # Downloads - let the front server stream files instead of a worker.
+    # Set USE_X_SENDFILE for Apache/lighttpd, or X_ACCEL_REDIRECT_PREFIX to
+    # an nginx internal location that maps to UPLOAD_FOLDER.
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() in ['true', 'on', '1']
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+    
+    # Background jobs - run with `flask worker`
+    JOBS_RUN_INLINE = False
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS') or 4)
+    JOB_POLL_INTERVAL = 1.0  # seconds between checks when the queue is empty
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BACKOFF = 30  # seconds before the first retry, doubled after each failure
+    JOB_TIMEOUT = 15 * 60  # running jobs older than this are assumed abandoned
+    JOB_RETENTION_DAYS = 7
+    
+    # Password hashing - 'scrypt[:n:r:p]' or 'pbkdf2[:hash[:iterations]]'.
+    # Hashes run in a process pool so logins don't block the web worker;
+    # existing hashes are redone on login when the method or cost changes
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)  # 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = 64  # logins waiting for the pool before they're turned away
+    PASSWORD_HASH_TIMEOUT = 10  # seconds a login waits for a slot, then for its hash
+    
+    # Failed logins allowed per email address and per client IP in a sliding
+    # window before further attempts are refused. 'sqlite' shares the counts
+    # between workers (in the CACHE_SQLITE_PATH file)
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or CACHE_BACKEND
+    LOGIN_RATE_WINDOW = 15 * 60  # seconds
+    LOGIN_FAILURES_PER_EMAIL = int(os.environ.get('LOGIN_FAILURES_PER_EMAIL') or 5)  # locks out the owner too
+    LOGIN_FAILURES_PER_IP = int(os.environ.get('LOGIN_FAILURES_PER_IP') or 50)  # schools share one address
+    
     # Session config - 30 min timeout seems reasonable
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
     SESSION_COOKIE_HTTPONLY = True
@@ -32,10 +74,30 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@printrequest.school.edu'
     MAIL_SUPPRESS_SEND = False  # turn this on if you don't want emails during dev
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE') or 2)  # open SMTP connections per process
+    MAIL_QUEUE_SIZE = 100  # emails waiting for a connection before senders block
+    MAIL_BATCH_SIZE = 20  # emails sent back to back on one connection
+    MAIL_IDLE_TIMEOUT = 30  # seconds before an unused connection is closed
+    # Monthly page quotas (pages x copies); 0 means no limit. Per-user and
+    # per-department overrides are set with `flask set-quota`
+    QUOTA_USER_PAGES = int(os.environ.get('QUOTA_USER_PAGES') or 0)
+    QUOTA_DEPARTMENT_PAGES = int(os.environ.get('QUOTA_DEPARTMENT_PAGES') or 0)
+    
+    # Print-room schedule
+    PRINT_SLA_HOURS = int(os.environ.get('PRINT_SLA_HOURS') or 48)  # requests are due this long after submission
+    PRINT_BATCH_MAX_SHEETS = 500  # split batches bigger than this
+    
+    # Socket.IO: None picks eventlet when installed; set a message queue URL
+    # (e.g. redis://) when running more than one web process
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    # Admins get one summary of new requests per interval (seconds); 0 emails them per request
+    ADMIN_DIGEST_INTERVAL = int(os.environ.get('ADMIN_DIGEST_INTERVAL') or 15 * 60)
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQLALCHEMY_RECORD_QUERIES = True  # logs the query count of each request
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'dev_print_requests.db')
     SESSION_COOKIE_SECURE = False
@@ -53,6 +115,11 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    JOBS_RUN_INLINE = True
+    MAIL_SUPPRESS_SEND = True
+    ADMIN_DIGEST_INTERVAL = 0
+    SOCKETIO_ASYNC_MODE = 'threading'
+    PASSWORD_HASH_WORKERS = 0
 
 
 config = {
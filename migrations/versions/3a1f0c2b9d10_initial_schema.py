@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 3a1f0c2b9d10
+Revises: 
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a1f0c2b9d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with `flask init-db` already have these tables
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('card_id', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('faculty_department', sa.String(length=100), nullable=False),
+    sa.Column('profile_picture', sa.String(length=255), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_users_card_id', 'users', ['card_id'], unique=True, if_not_exists=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True, if_not_exists=True)
+
+    op.create_table('print_requests',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_number', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('file_path', sa.String(length=255), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('number_of_pages', sa.Integer(), nullable=False),
+    sa.Column('page_range', sa.String(length=255), nullable=True),
+    sa.Column('number_of_copies', sa.Integer(), nullable=False),
+    sa.Column('is_double_sided', sa.Boolean(), nullable=False),
+    sa.Column('print_format', sa.String(length=10), nullable=False),
+    sa.Column('paper_size', sa.String(length=5), nullable=False),
+    sa.Column('is_stapled', sa.Boolean(), nullable=False),
+    sa.Column('is_laminated', sa.Boolean(), nullable=False),
+    sa.Column('clarifying_message', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_print_requests_request_number', 'print_requests', ['request_number'], unique=True, if_not_exists=True)
+
+    op.create_table('request_status_counts',
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('status'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('request_status_counts')
+    op.drop_index('ix_print_requests_request_number', table_name='print_requests')
+    op.drop_table('print_requests')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_card_id', table_name='users')
+    op.drop_table('users')
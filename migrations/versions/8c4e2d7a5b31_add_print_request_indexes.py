@@ -0,0 +1,28 @@
+"""add print request indexes
+
+Revision ID: 8c4e2d7a5b31
+Revises: 3a1f0c2b9d10
+Create Date: 2026-10-17 09:20:05.118422
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2d7a5b31'
+down_revision = '3a1f0c2b9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_print_requests_user_id_submitted_at', 'print_requests', ['user_id', 'submitted_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_print_requests_status_submitted_at', 'print_requests', ['status', 'submitted_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_print_requests_submitted_at', 'print_requests', ['submitted_at'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_print_requests_submitted_at', table_name='print_requests')
+    op.drop_index('ix_print_requests_status_submitted_at', table_name='print_requests')
+    op.drop_index('ix_print_requests_user_id_submitted_at', table_name='print_requests')
@@ -1,5 +1,6 @@
 import os
-from app import create_app, db
+import click
+from app import create_app, db, socketio
 from app.models import User, PrintRequest
 
 # create the app
@@ -19,10 +20,186 @@ def make_shell_context():
 @app.cli.command()
 def init_db():
     """initialize database tables"""
+    from flask_migrate import stamp
     db.create_all()
+    # tables are already current, so mark every migration as applied
+    stamp()
     print('✓ Database initialized')
 
 
+@app.cli.command()
+def rebuild_stats():
+    """rebuild the request status counters from history"""
+    from app.utils.stats import rebuild_status_counts
+    counts = rebuild_status_counts()
+    for status, count in counts.items():
+        print(f'  {status}: {count}')
+    print('✓ Status counters rebuilt')
+
+
+@app.cli.command()
+def reconcile_quotas():
+    """rebuild quota balances from request history"""
+    from app.utils.quotas import reconcile_quotas as rebuild
+    rows = rebuild()
+    print(f'✓ Rebuilt {rows} quota balances')
+
+
+@app.cli.command()
+@click.option('--user', 'email', help='email of the user to limit')
+@click.option('--department', help='department to limit')
+@click.option('--pages', type=int, required=True, help='pages per month (0 for no limit)')
+def set_quota(email, department, pages):
+    """set the monthly page quota for a user or department"""
+    from app.models import QuotaBudget
+    from app.utils.quotas import USER_SCOPE, DEPARTMENT_SCOPE
+    
+    if bool(email) == bool(department):
+        raise click.UsageError('Pass exactly one of --user or --department')
+    
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.UsageError(f'No user with email {email}')
+        scope, subject = USER_SCOPE, str(user.id)
+    else:
+        scope, subject = DEPARTMENT_SCOPE, department
+    
+    db.session.merge(QuotaBudget(scope=scope, subject=subject, pages=pages))
+    db.session.commit()
+    print(f'✓ {email or department}: {pages or "no limit"} pages per month')
+
+
+@app.cli.command()
+def explain_queries():
+    """check that the hot request queries use an index (SQLite only)"""
+    if db.engine.dialect.name != 'sqlite':
+        print('EXPLAIN QUERY PLAN is only supported on SQLite')
+        return
+    
+    from app.utils.query_plans import explain, get_hot_queries, is_full_scan
+    
+    failures = 0
+    for name, query in get_hot_queries().items():
+        details = explain(query)
+        full_scan = is_full_scan(details)
+        failures += full_scan
+        print(f'{"✗" if full_scan else "✓"} {name}')
+        for detail in details:
+            print(f'    {detail}')
+    
+    if failures:
+        raise SystemExit(f'{failures} queries do a full table scan')
+
+
+@app.cli.command()
+def migrate_documents():
+    """move uploaded documents into the content-addressed store"""
+    from app.utils import format_file_size
+    from app.utils.document_store import is_blob_path, import_legacy_file
+    
+    moved = missing = reclaimed = 0
+    legacy = [r for r in PrintRequest.query.all() if not is_blob_path(r.file_path)]
+    for print_request in legacy:
+        result = import_legacy_file(print_request.file_path)
+        if result is None:
+            missing += 1
+            print(f'  ✗ {print_request.request_number}: file not found')
+            continue
+        
+        print_request.file_path, print_request.file_hash, saved = result
+        reclaimed += saved
+        moved += 1
+        # commit as we go so the DB matches the files if interrupted
+        db.session.commit()
+    
+    print(f'✓ Moved {moved} documents ({missing} missing)')
+    print(f'✓ Reclaimed {format_file_size(reclaimed)} from duplicates')
+
+
+@app.cli.command()
+@click.option('--concurrency', '-c', type=int, help='number of worker threads')
+def worker(concurrency):
+    """run background jobs (emails, document analysis)"""
+    from app.utils.jobs import run_worker
+    print(f'Worker started with {concurrency or app.config["JOB_WORKER_THREADS"]} threads (Ctrl+C to stop)')
+    run_worker(app, concurrency=concurrency)
+
+
+@app.cli.command()
+@click.option('--hours', type=int, default=24, help='only include jobs from the last N hours')
+def jobs_stats(hours):
+    """show background job counts and latency"""
+    from datetime import datetime, timedelta
+    from app.utils.jobs import get_job_stats
+    
+    stats = get_job_stats(since=datetime.utcnow() - timedelta(hours=hours))
+    if not stats:
+        print('No jobs')
+        return
+    
+    for kind, s in sorted(stats.items()):
+        print(f'{kind}: {s["done"]} done, {s["failed"]} failed, {s["queued"]} queued, {s["running"]} running')
+        print(f'    wait avg {s["avg_wait"]:.2f}s p95 {s["p95_wait"]:.2f}s | '
+              f'run avg {s["avg_run"]:.2f}s p95 {s["p95_run"]:.2f}s')
+
+
+@app.cli.command()
+@click.option('--seconds', type=float, default=5, help='how long to run')
+@click.option('--concurrency', '-c', type=int, default=16, help='simultaneous logins')
+@click.option('--green/--no-green', default=None,
+              help='hash the way an eventlet web worker does (default: when eventlet is installed)')
+def password_benchmark(seconds, concurrency, green):
+    """measure password checks per second with the current hash settings"""
+    import threading
+    import time
+    from importlib.util import find_spec
+    from app.utils.passwords import make_password_hasher
+
+    # The Procfile's web worker runs under eventlet, so measure that setup
+    if green is None:
+        green = find_spec('eventlet') is not None
+    hasher = make_password_hasher(app, green=green)
+    pwhash = hasher.hash('benchmark-password')
+    hasher.verify(pwhash, 'benchmark-password')  # start the pool before timing
+
+    checks = []
+    deadline = time.monotonic() + seconds
+
+    def login_loop():
+        done = 0
+        while time.monotonic() < deadline:
+            hasher.verify(pwhash, 'benchmark-password')
+            done += 1
+        checks.append(done)
+
+    started = time.monotonic()
+    if green:
+        import eventlet
+        pool = eventlet.GreenPool(concurrency)
+        for _ in range(concurrency):
+            pool.spawn(login_loop)
+        pool.waitall()
+    else:
+        threads = [threading.Thread(target=login_loop) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.monotonic() - started
+
+    if not hasher.workers:
+        mode = 'inline'
+    elif hasher.green:
+        mode = 'eventlet tpool'
+    else:
+        mode = f'{hasher.workers} pool workers'
+    cores = min(hasher.workers, os.cpu_count() or 1) or 1
+    rate = sum(checks) / elapsed
+    print(f'{hasher.method}, {mode}, {concurrency} concurrent logins')
+    print(f'  {sum(checks)} checks in {elapsed:.1f}s: {rate:.1f} logins/s, {rate / cores:.1f} per core')
+
+
 @app.cli.command()
 def seed_db():
     """add some sample data for testing"""
@@ -70,4 +247,4 @@ def seed_db():
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    socketio.run(app, debug=True)
@@ -0,0 +1,107 @@
+"""
+Shared fixtures: an in-memory app per test, users and a SQL statement counter
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db as _db
+from app.models import PrintRequest, User
+
+PASSWORD = 'pw123456'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing')
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        # Cheap hashes keep the suite fast
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000'
+    )
+    with app.app_context():
+        _db.create_all()
+    yield app
+    with app.app_context():
+        _db.session.remove()
+        _db.drop_all()
+
+
+def make_user(email, is_admin=False, department='High School'):
+    """Add a user with the test password"""
+    user = User(
+        card_id=email.split('@')[0].upper(),
+        name=email.split('@')[0].title(),
+        email=email,
+        faculty_department=department,
+        is_admin=is_admin
+    )
+    user.set_password(PASSWORD)
+    _db.session.add(user)
+    _db.session.commit()
+    return user.id
+
+
+def make_requests(user_id, count, status='pending'):
+    """Add print requests for a user"""
+    for _ in range(count):
+        _db.session.add(PrintRequest(
+            request_number=PrintRequest.generate_request_number(),
+            user_id=user_id,
+            file_path='documents/test.pdf',
+            file_name='test.pdf',
+            number_of_pages=2,
+            number_of_copies=1,
+            print_format='bw',
+            paper_size='A4',
+            status=status
+        ))
+    _db.session.commit()
+
+
+# Fixtures and tests open an app context only around their own database
+# work: a context left open would be shared by every test client request.
+
+@pytest.fixture
+def admin_id(app):
+    with app.app_context():
+        return make_user('admin@school.edu', is_admin=True, department='IT Department')
+
+
+@pytest.fixture
+def teacher_id(app):
+    with app.app_context():
+        return make_user('teacher@school.edu')
+
+
+def login(client, email):
+    return client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+
+
+@pytest.fixture
+def admin_client(app, admin_id):
+    client = app.test_client()
+    login(client, 'admin@school.edu')
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """Count the SQL statements run inside a with block"""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = _db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return counter
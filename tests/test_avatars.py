@@ -0,0 +1,96 @@
+"""
+Profile pictures
+"""
+import io
+import os
+
+from PIL import Image
+
+from app import db
+from app.models import Job, User
+from tests.conftest import login
+
+
+def _image(color):
+    output = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(output, 'PNG')
+    output.seek(0)
+    return output
+
+
+def _upload(client, color):
+    return client.post('/profile/edit', data={
+        'name': 'Teacher',
+        'profile_picture': (_image(color), 'me.png')
+    }, content_type='multipart/form-data')
+
+
+def _picture(app, teacher_id):
+    with app.app_context():
+        return db.session.get(User, teacher_id).profile_picture
+
+
+def _picture_url(picture):
+    name = os.path.splitext(os.path.basename(picture))[0]
+    return f'/profile/picture/{name}/small'
+
+
+def test_picture_is_cached_for_good(app, teacher_id):
+    client = app.test_client()
+    login(client, 'teacher@school.edu')
+    _upload(client, 'red')
+    url = _picture_url(_picture(app, teacher_id))
+
+    response = client.get(url, headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert response.cache_control.max_age == 365 * 24 * 60 * 60
+    assert response.cache_control.private
+    assert not response.cache_control.public
+    assert response.cache_control.immutable
+    assert 'Accept' in response.vary
+
+    again = client.get(url, headers={'Accept': 'image/webp,*/*', 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_same_image_keeps_its_url(app, teacher_id):
+    client = app.test_client()
+    login(client, 'teacher@school.edu')
+    _upload(client, 'red')
+    first = _picture(app, teacher_id)
+    _upload(client, 'red')
+
+    assert _picture(app, teacher_id) == first
+    assert client.get(_picture_url(first)).status_code == 200
+
+
+def test_replaced_picture_outlives_user_cache(app, teacher_id):
+    app.config['JOBS_RUN_INLINE'] = False
+    client = app.test_client()
+    login(client, 'teacher@school.edu')
+    _upload(client, 'red')
+    old = _picture(app, teacher_id)
+    _upload(client, 'blue')
+
+    assert _picture(app, teacher_id) != old
+    # Other workers may still render the old URL until their cache expires
+    assert client.get(_picture_url(old)).status_code == 200
+    with app.app_context():
+        job = Job.query.filter_by(kind='delete_avatar').one()
+        assert job.payload == {'relative_path': old}
+        assert (job.run_at - job.created_at).total_seconds() >= app.config['USER_CACHE_TTL']
+
+
+def test_retired_picture_is_deleted(app, teacher_id):
+    # Jobs run inline here, as if the delay had passed
+    client = app.test_client()
+    login(client, 'teacher@school.edu')
+    _upload(client, 'red')
+    old = _picture(app, teacher_id)
+    client.get(_picture_url(old))
+    _upload(client, 'blue')
+
+    assert client.get(_picture_url(old)).status_code == 404
+    variants = os.listdir(os.path.join(app.config['UPLOAD_FOLDER'], 'profiles', 'variants'))
+    assert not [v for v in variants if v.startswith(os.path.basename(old)[:-4])]
@@ -0,0 +1,97 @@
+"""
+Content-addressed document storage
+"""
+import os
+
+from app import db
+from app.models import DocumentBlob
+from app.utils import get_file_size
+from app.utils.document_store import release_blob, store_blob
+
+
+def _incoming(app, name, data):
+    """Write an upload into the incoming folder, as save_document does"""
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], 'documents', '.incoming')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_get_file_size_leaves_blob_alone(app):
+    with app.app_context():
+        path, _ = store_blob(_incoming(app, 'a', b'hello'), 'ab' * 32, 5)
+        db.session.commit()
+
+        assert get_file_size(path) == 5
+        assert get_file_size(path) == 5
+        db.session.commit()
+
+        assert db.session.get(DocumentBlob, 'ab' * 32).ref_count == 1
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path))
+
+
+def test_store_blob_counts_every_upload(app):
+    with app.app_context():
+        path, is_new = store_blob(_incoming(app, 'a', b'hello'), 'cd' * 32, 5)
+        assert is_new
+        # A second upload of the same contents, e.g. one racing the first
+        same_path, is_new = store_blob(_incoming(app, 'b', b'hello'), 'cd' * 32, 5)
+        db.session.commit()
+
+        assert same_path == path
+        assert not is_new
+        assert db.session.get(DocumentBlob, 'cd' * 32).ref_count == 2
+
+
+def test_release_removes_file_after_commit(app):
+    with app.app_context():
+        path, _ = store_blob(_incoming(app, 'a', b'hello'), 'ef' * 32, 5)
+        db.session.commit()
+        absolute_path = os.path.join(app.config['UPLOAD_FOLDER'], path)
+
+        assert release_blob(path)
+        assert os.path.exists(absolute_path)
+        db.session.commit()
+
+        assert not os.path.exists(absolute_path)
+        assert db.session.get(DocumentBlob, 'ef' * 32) is None
+
+
+def test_rolled_back_release_keeps_blob(app):
+    with app.app_context():
+        path, _ = store_blob(_incoming(app, 'a', b'hello'), 'ef' * 32, 5)
+        db.session.commit()
+
+        assert release_blob(path)
+        db.session.rollback()
+        db.session.commit()
+
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path))
+        assert db.session.get(DocumentBlob, 'ef' * 32).ref_count == 1
+
+
+def test_release_keeps_blob_stored_again(app):
+    with app.app_context():
+        path, _ = store_blob(_incoming(app, 'a', b'hello'), 'ef' * 32, 5)
+        db.session.commit()
+
+        # The last reference goes while the same file is being uploaded again
+        assert release_blob(path)
+        store_blob(_incoming(app, 'b', b'hello'), 'ef' * 32, 5)
+        db.session.commit()
+
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path))
+        assert db.session.get(DocumentBlob, 'ef' * 32).ref_count == 1
+
+
+def test_store_blob_without_on_conflict(app, monkeypatch):
+    # Databases without INSERT ... ON CONFLICT use a savepoint instead
+    monkeypatch.setattr('app.utils.upsert.UPSERT_INSERTS', {})
+    with app.app_context():
+        assert store_blob(_incoming(app, 'a', b'hello'), '12' * 32, 5)[1]
+        assert not store_blob(_incoming(app, 'b', b'hello'), '12' * 32, 5)[1]
+        db.session.commit()
+
+        assert db.session.get(DocumentBlob, '12' * 32).ref_count == 2
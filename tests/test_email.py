@@ -0,0 +1,25 @@
+"""
+Admin digest emails
+"""
+from app.models import Job
+from app.utils.email import send_admin_digest
+from tests.conftest import make_requests
+
+
+def test_digest_reschedules_for_requests_in_settle_gap(app, teacher_id):
+    app.config.update(JOBS_RUN_INLINE=False, ADMIN_DIGEST_INTERVAL=900)
+    with app.app_context():
+        # Submitted just now, so too recent for this digest
+        make_requests(teacher_id, 1)
+        send_admin_digest()
+
+        assert Job.query.filter_by(kind='send_admin_digest', status='queued').count() == 1
+        assert Job.query.filter_by(kind='send_email').count() == 0
+
+
+def test_digest_stops_when_nothing_is_waiting(app, teacher_id):
+    app.config.update(JOBS_RUN_INLINE=False, ADMIN_DIGEST_INTERVAL=900)
+    with app.app_context():
+        send_admin_digest()
+
+        assert Job.query.filter_by(kind='send_admin_digest').count() == 0
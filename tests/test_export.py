@@ -0,0 +1,36 @@
+"""
+CSV export of requests
+"""
+import pytest
+
+from app.utils.analytics import _spreadsheet_safe
+from tests.conftest import make_requests
+
+
+@pytest.mark.parametrize('status', ['nope', 'pending\r\nX-Injected: 1', 'all; filename=evil.exe'])
+def test_export_rejects_unknown_status(admin_client, status):
+    response = admin_client.get('/admin/requests/export', query_string={'status': status})
+    assert response.status_code == 400
+    assert 'X-Injected' not in response.headers
+
+
+def test_export_filters_by_status(app, admin_client, teacher_id):
+    with app.app_context():
+        make_requests(teacher_id, 2, status='pending')
+        make_requests(teacher_id, 1, status='completed')
+
+    response = admin_client.get('/admin/requests/export?status=completed')
+    lines = response.get_data(as_text=True).strip().splitlines()
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=print_requests_completed_')
+    assert len(lines) == 2  # header and one row
+
+
+@pytest.mark.parametrize('value', ['=1+1', '+1', '-1', '@SUM(A1)', '\t=1+1', '\r=1+1'])
+def test_formula_triggers_are_escaped(value):
+    assert _spreadsheet_safe(value) == "'" + value
+
+
+def test_plain_values_are_kept():
+    assert _spreadsheet_safe('Worksheet 1') == 'Worksheet 1'
+    assert _spreadsheet_safe(3) == 3
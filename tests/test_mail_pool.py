@@ -0,0 +1,117 @@
+"""
+Pooled SMTP sending, against a stand-in for Flask-Mail
+"""
+import smtplib
+import threading
+
+import pytest
+
+from app.utils.mail_pool import MailDispatcher, MailQueueFull
+
+
+class FakeConnection:
+    """Records what is sent on it, like flask_mail.Connection"""
+
+    def __init__(self, server):
+        self.server = server
+        self.sent = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def send(self, msg):
+        self.server.on_send(self, msg)
+        self.sent.append(msg)
+
+
+class FakeMail:
+    """Stands in for the Mail extension: connect() opens a new connection"""
+
+    def __init__(self):
+        self.connections = []
+        self.release = threading.Event()
+        self.release.set()
+        self.sending = threading.Event()
+        self.drop_next = False
+
+    def connect(self):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    def on_send(self, connection, msg):
+        self.sending.set()
+        self.release.wait(5)
+        if self.drop_next:
+            self.drop_next = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+    @property
+    def sent(self):
+        return [msg for connection in self.connections for msg in connection.sent]
+
+
+@pytest.fixture
+def mail():
+    mail = FakeMail()
+    yield mail
+    mail.release.set()
+
+
+def _block_sender(dispatcher, mail):
+    """Hold the only sender in the middle of sending a message"""
+    mail.release.clear()
+    first = dispatcher.submit('first')
+    assert mail.sending.wait(5)
+    return first
+
+
+def test_waiting_messages_share_one_connection(app, mail):
+    dispatcher = MailDispatcher(app, mail, workers=1, queue_size=10, batch_size=20)
+    first = _block_sender(dispatcher, mail)
+    futures = [dispatcher.submit(f'msg {i}') for i in range(5)]
+    mail.release.set()
+
+    for future in [first] + futures:
+        future.result(timeout=5)
+    assert mail.sent == ['first'] + [f'msg {i}' for i in range(5)]
+    assert len(mail.connections) == 1
+    assert not mail.connections[0].closed
+
+
+def test_full_queue_pushes_back(app, mail):
+    dispatcher = MailDispatcher(app, mail, workers=1, queue_size=1)
+    _block_sender(dispatcher, mail)
+    dispatcher.submit('waiting')
+
+    with pytest.raises(MailQueueFull):
+        dispatcher.submit('one too many', timeout=0.1)
+
+
+def test_timed_out_message_is_not_sent_later(app, mail):
+    dispatcher = MailDispatcher(app, mail, workers=1, queue_size=10)
+    first = _block_sender(dispatcher, mail)
+
+    with pytest.raises(MailQueueFull):
+        dispatcher.send('late', timeout=0.1)
+    mail.release.set()
+    first.result(timeout=5)
+    dispatcher.send('next', timeout=5)
+
+    # A job retry sends 'late' again, so the pool must not have sent it
+    assert mail.sent == ['first', 'next']
+
+
+def test_dropped_connection_is_closed_and_replaced(app, mail):
+    dispatcher = MailDispatcher(app, mail, workers=1, queue_size=10)
+    dispatcher.send('first', timeout=5)
+    mail.drop_next = True
+    dispatcher.send('second', timeout=5)
+
+    assert len(mail.connections) == 2
+    assert mail.connections[0].closed
+    assert mail.sent == ['first', 'second']
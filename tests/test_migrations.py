@@ -0,0 +1,49 @@
+"""
+Data migrations
+"""
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.models import QuotaBalance
+from app.utils.quotas import reconcile_quotas
+
+
+def _balances():
+    return sorted(
+        (b.scope, b.subject, b.period, b.reserved_pages, b.used_pages)
+        for b in QuotaBalance.query.all()
+    )
+
+
+def test_quota_migration_backfills_balances():
+    app = create_app('testing')
+    with app.app_context():
+        upgrade(revision='062cc47cf1d0')
+        db.session.execute(db.text(
+            "INSERT INTO users (id, card_id, name, email, password_hash, faculty_department, is_admin, created_at) "
+            "VALUES (1, 'T1', 'One', 'one@school.edu', 'x', 'High School', 0, '2026-09-01'), "
+            "(2, 'T2', 'Two', 'two@school.edu', 'x', 'High School', 0, '2026-09-01')"
+        ))
+        rows = [
+            (1, 'pending', '2026-09-03', 10, 2),
+            (1, 'completed', '2026-09-04', 5, 1),
+            (1, 'completed', '2026-10-01', 3, 3),
+            (2, 'in_progress', '2026-09-10', 4, 1),
+            (2, 'cancelled', '2026-09-11', 50, 1),
+        ]
+        for number, (user_id, status, submitted_at, pages, copies) in enumerate(rows, 1):
+            db.session.execute(db.text(
+                "INSERT INTO print_requests (request_number, user_id, file_path, file_name, number_of_pages, "
+                "number_of_copies, is_double_sided, print_format, paper_size, is_stapled, is_laminated, "
+                "status, submitted_at, updated_at) VALUES (:number, :user_id, 'f.pdf', 'f.pdf', :pages, "
+                ":copies, 0, 'bw', 'A4', 0, 0, :status, :submitted_at, :submitted_at)"
+            ), dict(number=f'PR-{number}', user_id=user_id, status=status, submitted_at=submitted_at,
+                    pages=pages, copies=copies))
+        db.session.commit()
+
+        upgrade()
+        migrated = _balances()
+        reconcile_quotas()
+
+        assert migrated == _balances()
+        assert ('department', 'High School', '2026-09', 24, 5) in migrated
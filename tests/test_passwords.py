@@ -0,0 +1,65 @@
+"""
+Password hashing off the request thread
+"""
+import subprocess
+import sys
+
+import pytest
+
+from app.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+GREEN_LOGIN = '''
+import eventlet
+eventlet.monkey_patch()
+
+from app import create_app
+from app.utils.passwords import get_password_hasher
+from eventlet import tpool
+
+app = create_app('testing')
+app.config['PASSWORD_HASH_WORKERS'] = 2
+with app.app_context():
+    hasher = get_password_hasher()
+    assert hasher.green
+    assert hasher.verify(hasher.hash('pw123456'), 'pw123456')
+    assert tpool._nthreads == 2
+print('ok')
+'''
+
+GREEN_TIMEOUT = '''
+import eventlet
+eventlet.monkey_patch()
+
+from app.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+hasher = PasswordHasher('pbkdf2:sha256:1000000', workers=1, max_pending=1, green=True, timeout=0.05)
+for _ in range(2):
+    # The second call finds the first hash still holding the only slot
+    try:
+        hasher.hash('pw123456')
+    except PasswordHasherBusy:
+        pass
+    else:
+        raise AssertionError('hash did not time out')
+while hasher._slots.balance == 0:
+    eventlet.sleep(0.05)
+print('ok')
+'''
+
+
+@pytest.mark.parametrize('script', [GREEN_LOGIN, GREEN_TIMEOUT], ids=['login', 'timeout'])
+def test_hashing_under_eventlet(script):
+    pytest.importorskip('eventlet')
+    # Own interpreter: monkey patching can't be undone in this one
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'ok'
+
+
+def test_slow_hash_times_out_but_keeps_its_slot():
+    hasher = PasswordHasher('pbkdf2:sha256:1000000', workers=1, max_pending=1, timeout=0.05)
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('pw123456')
+    # Still hashing, so nothing else may start
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('pw123456')
@@ -0,0 +1,65 @@
+"""
+PDF page counts
+"""
+import io
+import zlib
+
+import pytest
+
+from app.models import PrintRequest
+from app.utils.pdf_info import MAX_STREAM_SIZE, PdfStructureError, _PdfFile, count_pdf_pages
+from tests.conftest import login
+
+
+def make_pdf(pages):
+    """A minimal PDF with a classic xref table and a /Count of pages"""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count %d >>' % pages,
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>',
+    ]
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b'%010d 00000 n \n' % offset)
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\n' % (len(objects) + 1))
+    output.write(b'startxref\n%d\n%%%%EOF\n' % xref)
+    return output.getvalue()
+
+
+def test_count_pdf_pages(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(12))
+    assert count_pdf_pages(str(path)) == 12
+
+
+def test_oversized_stream_is_rejected():
+    # An xref stream that inflates to more than the cap
+    payload = zlib.compress(b'\0' * (MAX_STREAM_SIZE + 1))
+    data = (b'%PDF-1.5\n1 0 obj\n<< /Type /XRef /W [1 2 1] /Size 1 /Filter /FlateDecode /Length '
+            + str(len(payload)).encode() + b' >>\nstream\n' + payload + b'\nendstream\nendobj\n'
+            + b'startxref\n9\n%%EOF\n')
+    with pytest.raises(PdfStructureError):
+        _PdfFile(data)
+
+
+def test_detected_page_count_is_bounded(app, teacher_id):
+    client = app.test_client()
+    login(client, 'teacher@school.edu')
+
+    response = client.post('/requests/new', data={
+        'file': (io.BytesIO(make_pdf(5000)), 'huge.pdf'),
+        'number_of_copies': 1,
+        'print_format': 'bw',
+        'paper_size': 'A4'
+    }, content_type='multipart/form-data', follow_redirects=True)
+
+    assert b'5000 pages' in response.data
+    with app.app_context():
+        assert PrintRequest.query.count() == 0
@@ -0,0 +1,42 @@
+"""
+Query counts for the admin lists: eager loading keeps them flat as rows grow
+"""
+import pytest
+
+from tests.conftest import make_requests, make_user
+
+
+def _statements_for(client, count_queries, url):
+    """SQL statements one GET runs, after a warm-up request fills the caches"""
+    assert client.get(url).status_code == 200
+    with count_queries() as statements:
+        assert client.get(url).status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', ['/admin/requests', '/admin/dashboard', '/admin/users'])
+def test_admin_lists_run_constant_queries(app, admin_client, count_queries, url):
+    with app.app_context():
+        make_requests(make_user('first@school.edu'), 2)
+    small = _statements_for(admin_client, count_queries, url)
+
+    # More users, each with their own requests, must not add per-row queries
+    with app.app_context():
+        for i in range(10):
+            make_requests(make_user(f'teacher{i}@school.edu'), 2)
+    large = _statements_for(admin_client, count_queries, url)
+
+    assert large == small
+
+
+def test_view_user_runs_constant_queries(app, admin_client, count_queries, teacher_id):
+    url = f'/admin/user/{teacher_id}'
+    with app.app_context():
+        make_requests(teacher_id, 1)
+    small = _statements_for(admin_client, count_queries, url)
+
+    with app.app_context():
+        make_requests(teacher_id, 15)
+    large = _statements_for(admin_client, count_queries, url)
+
+    assert large == small
@@ -0,0 +1,11 @@
+"""
+EXPLAIN QUERY PLAN checks: the hot request-list queries must use an index
+"""
+from app.utils.query_plans import explain, get_hot_queries, is_full_scan
+
+
+def test_hot_queries_use_an_index(app):
+    with app.app_context():
+        plans = {name: explain(query) for name, query in get_hot_queries().items()}
+    full_scans = {name: details for name, details in plans.items() if is_full_scan(details)}
+    assert not full_scans
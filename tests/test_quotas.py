@@ -0,0 +1,30 @@
+"""
+Running quota balances
+"""
+import pytest
+
+from app import db
+from app.models import PrintRequest, QuotaBalance
+from app.utils.quotas import DEPARTMENT_SCOPE, USER_SCOPE, get_quota_period, get_quota_usage
+from tests.conftest import make_requests, make_user
+
+
+@pytest.mark.parametrize('on_conflict', [True, False])
+def test_balances_follow_requests(app, teacher_id, monkeypatch, on_conflict):
+    if not on_conflict:
+        # Databases without INSERT ... ON CONFLICT use a savepoint instead
+        monkeypatch.setattr('app.utils.upsert.UPSERT_INSERTS', {})
+    with app.app_context():
+        other_id = make_user('other@school.edu')
+        make_requests(teacher_id, 2)
+        make_requests(other_id, 1)
+
+        # Both users share the department's balance row
+        assert get_quota_usage(USER_SCOPE, teacher_id) == 4
+        assert get_quota_usage(DEPARTMENT_SCOPE, 'High School') == 6
+
+        PrintRequest.query.filter_by(user_id=other_id).one().update_status('completed')
+        db.session.commit()
+
+        balance = db.session.get(QuotaBalance, (DEPARTMENT_SCOPE, 'High School', get_quota_period()))
+        assert (balance.reserved_pages, balance.used_pages) == (4, 2)
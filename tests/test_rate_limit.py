@@ -0,0 +1,84 @@
+"""
+Failed-login rate limits
+"""
+import pytest
+
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryRateLimiter, SQLiteRateLimiter, _advance, _estimate
+from tests.conftest import PASSWORD, login
+
+
+def test_estimate_weights_previous_window():
+    # 4 attempts in window 0, 2 so far in window 1, a quarter of the way in
+    entry = _advance(_advance(None, 0, 100), 10, 100)
+    for _ in range(2):
+        entry = _advance(entry, 20, 100)
+    entry = _advance(entry, 110, 100)
+    entry = _advance(entry, 120, 100)
+
+    assert entry == [1, 2, 4]
+    assert _estimate(entry, 125, 100) == 4 * 0.75 + 2
+    # A window later only the last window's attempts still overlap
+    assert _estimate(entry, 250, 100) == 2 * 0.5
+    assert _estimate(entry, 300, 100) == 0
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_limiter(request, tmp_path):
+    if request.param == 'memory':
+        shared = MemoryRateLimiter(window=100)
+        return lambda: shared
+    return lambda: SQLiteRateLimiter(str(tmp_path / 'limits.db'), window=100)
+
+
+def test_limiter_counts_and_resets(make_limiter, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: now[0])
+    limiter = make_limiter()
+
+    for _ in range(3):
+        limiter.hit('login:email:a')
+    assert limiter.count('login:email:a') == 3
+    assert limiter.count('login:email:b') == 0
+
+    # Another worker sees the same counts
+    assert make_limiter().count('login:email:a') == 3
+
+    now[0] = 1150.0
+    assert limiter.count('login:email:a') == pytest.approx(1.5)
+    limiter.reset('login:email:a')
+    assert limiter.count('login:email:a') == 0
+
+
+def _bad_logins(client, email, count):
+    for _ in range(count):
+        client.post('/auth/login', data={'email': email, 'password': 'wrong-password'})
+
+
+def test_repeated_failures_get_429(app, teacher_id):
+    client = app.test_client()
+    _bad_logins(client, 'teacher@school.edu', app.config['LOGIN_FAILURES_PER_EMAIL'])
+
+    # Refused before the password is checked, so even the right one is turned away
+    assert login(client, 'teacher@school.edu').status_code == 429
+    # Other addresses from the same IP are unaffected
+    assert client.post('/auth/login', data={'email': 'other@school.edu', 'password': PASSWORD}).status_code == 200
+
+
+def test_ip_limit(app, teacher_id):
+    app.config['LOGIN_FAILURES_PER_IP'] = 3
+    client = app.test_client()
+    for n in range(3):
+        _bad_logins(client, f'user{n}@school.edu', 1)
+
+    assert login(client, 'teacher@school.edu').status_code == 429
+
+
+def test_success_clears_failures(app, teacher_id):
+    client = app.test_client()
+    _bad_logins(client, 'teacher@school.edu', app.config['LOGIN_FAILURES_PER_EMAIL'] - 1)
+    assert login(client, 'teacher@school.edu').status_code == 302
+    client.get('/auth/logout')
+
+    _bad_logins(client, 'teacher@school.edu', app.config['LOGIN_FAILURES_PER_EMAIL'] - 1)
+    assert login(client, 'teacher@school.edu').status_code == 302
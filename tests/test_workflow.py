@@ -0,0 +1,104 @@
+"""
+Status transitions, their history and turnaround times
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import PrintRequest, RequestEvent
+from app.utils.bulk import bulk_update_status
+from app.utils.workflow import TRANSITIONS, check_transition, get_turnaround_metrics, record_event
+from tests.conftest import make_requests
+
+START = datetime(2026, 9, 1, 8, 0)
+
+
+@pytest.mark.parametrize('old_status, new_status', [
+    (old, new) for old in TRANSITIONS for new in TRANSITIONS if old != new
+])
+def test_check_transition_follows_table(old_status, new_status):
+    allowed, _ = check_transition(old_status, new_status)
+    assert allowed == (new_status in TRANSITIONS[old_status])
+
+
+def test_update_status_refuses_illegal_move(app, teacher_id):
+    with app.app_context():
+        make_requests(teacher_id, 1, status='completed')
+        print_request = PrintRequest.query.one()
+
+        with pytest.raises(ValueError):
+            print_request.update_status('pending')
+
+
+def test_bulk_move_is_all_or_nothing(app, teacher_id, admin_id):
+    with app.app_context():
+        make_requests(teacher_id, 2)
+        make_requests(teacher_id, 1, status='completed')
+        ids = [r.id for r in PrintRequest.query.all()]
+        events = RequestEvent.query.count()
+
+        success, message, changed = bulk_update_status(ids, 'cancelled', actor_id=admin_id)
+
+        assert not success
+        assert 'cannot be moved' in message
+        assert changed == []
+        assert PrintRequest.query.filter_by(status='pending').count() == 2
+        assert RequestEvent.query.count() == events
+
+
+def _history(request_id, *steps):
+    """Replace a request's history with (hours after START, old, new) steps"""
+    RequestEvent.query.filter_by(request_id=request_id).delete()
+    for hours, old_status, new_status in steps:
+        record_event(db.session, request_id, old_status, new_status,
+                     created_at=START + timedelta(hours=hours))
+    db.session.commit()
+
+
+def test_turnaround_measures_the_completed_cycle(app, teacher_id):
+    with app.app_context():
+        make_requests(teacher_id, 2)
+        first, reopened = [r.id for r in PrintRequest.query.order_by(PrintRequest.id)]
+        _history(first, (0, None, 'pending'), (2, 'pending', 'in_progress'), (3, 'in_progress', 'completed'))
+        _history(reopened,
+                 (0, None, 'pending'), (1, 'pending', 'in_progress'), (5, 'in_progress', 'cancelled'),
+                 (20, 'cancelled', 'pending'), (24, 'pending', 'in_progress'), (26, 'in_progress', 'completed'))
+
+        metrics = get_turnaround_metrics()
+
+        assert metrics['completed'] == 2
+        assert metrics['queue'] == {'avg_hours': 3.0, 'median_hours': 3.0}
+        assert metrics['printing'] == {'avg_hours': 1.5, 'median_hours': 1.5}
+        assert metrics['total'] == {'avg_hours': 4.5, 'median_hours': 4.5}
+
+
+def test_turnaround_report(app, admin_client, teacher_id):
+    with app.app_context():
+        make_requests(teacher_id, 1)
+        request_id = PrintRequest.query.one().id
+        _history(request_id, (0, None, 'pending'), (1, 'pending', 'completed'))
+
+    response = admin_client.get('/admin/reports/turnaround?from=2026-09-01&to=2026-09-01')
+    assert response.status_code == 200
+    assert response.json['completed'] == 1
+    assert response.json['total']['avg_hours'] == 1.0
+    assert response.json['queue']['avg_hours'] is None
+
+    assert admin_client.get('/admin/reports/turnaround?from=2026-09-02').json['completed'] == 0
+    assert admin_client.get('/admin/reports/turnaround?from=Sept').status_code == 400
+
+
+def test_bulk_move_logs_email_failure(app, admin_client, teacher_id, monkeypatch, caplog):
+    def fail(*args, **kwargs):
+        raise RuntimeError('SMTP down')
+    monkeypatch.setattr('app.utils.email.send_bulk_status_emails', fail)
+    with app.app_context():
+        make_requests(teacher_id, 2)
+        ids = [r.id for r in PrintRequest.query.all()]
+
+    response = admin_client.post('/admin/requests/bulk-status', json={'ids': ids, 'status': 'in_progress'})
+
+    assert response.json['success']
+    assert 'Email notifications failed' in response.json['message']
+    assert 'SMTP down' in caplog.text